@@ -0,0 +1,210 @@
+import datetime
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+console = Console(stderr=True)
+
+# the same as what console script of the package does
+CLI = [
+    sys.executable,
+    '-c',
+    'from config_keeper.commands import cli; cli(prog_name="config-keeper")',
+]
+
+
+class TResult(t.TypedDict):
+    name: str
+    runs: list[float]
+    min: float
+    median: float
+    extra: dict[str, t.Any]
+
+
+class Sandbox:
+    """
+    Temporary directory with its own config file and data directory, so
+    ``config-keeper`` run by benchmarks does not touch real ones. Use as
+    context manager to remove the directory after.
+    """
+
+    def __init__(self):
+        self.root = Path(tempfile.mkdtemp(prefix='config_keeper_bench_'))
+        self.config_file = self.root / 'config.yaml'
+        self.data_dir = self.root / 'data'
+
+    def __enter__(self) -> 'Sandbox':
+        return self
+
+    def __exit__(self, *args: object):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    @property
+    def env(self) -> dict[str, str]:
+        return {
+            **os.environ,
+            'CONFIG_KEEPER_CONFIG_FILE': str(self.config_file),
+            'CONFIG_KEEPER_DATA_DIR': str(self.data_dir),
+        }
+
+    def save_config(self, conf: dict[str, t.Any]):
+        self.config_file.write_text(yaml.dump(conf))
+
+    def create_repo(self, name: str) -> str:
+        """
+        Creates bare repository and returns its ``file://`` URL.
+        """
+        path = self.root / name
+        run_git(['init', '--bare', '--initial-branch=main', str(path)])
+        return path.as_uri()
+
+    def run(
+        self,
+        args: list[str],
+        env: dict[str, str] | None = None,
+    ) -> tuple[float, str]:
+        """
+        Runs ``config-keeper`` with ``args`` in a new process and returns its
+        wall time in seconds and output. ``env`` is added to environment.
+        """
+        started = time.perf_counter()
+        result = subprocess.run(
+            [*CLI, *args],
+            env={**self.env, **(env or {})},
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            msg = (
+                f'config-keeper {" ".join(args)} exited with code '
+                f'{result.returncode}:\n{result.stdout}{result.stderr}'
+            )
+            raise RuntimeError(msg)
+        return elapsed, result.stdout
+
+
+def run_git(args: list[str]) -> str:
+    return subprocess.run(
+        ['git', *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def make_result(
+    name: str,
+    runs: list[float],
+    **extra: t.Any,
+) -> TResult:
+    return {
+        'name': name,
+        'runs': runs,
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'extra': extra,
+    }
+
+
+def get_metadata() -> dict[str, str]:
+    """
+    Returns information about environment to tell results apart.
+    """
+    return {
+        'version': importlib.metadata.version('config-keeper2'),
+        'python': platform.python_version(),
+        'git': run_git(['--version']).strip(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(tz=datetime.UTC).isoformat(),
+    }
+
+
+def save_results(
+    path: Path,
+    benchmark: str,
+    parameters: dict[str, t.Any],
+    results: list[TResult],
+):
+    path.write_text(json.dumps({
+        'benchmark': benchmark,
+        'metadata': get_metadata(),
+        'parameters': parameters,
+        'results': results,
+    }, indent=2))
+
+
+def find_regressions(
+    results: list[TResult],
+    baseline: Path,
+    tolerance: float,
+) -> list[str]:
+    """
+    Compares medians of ``results`` with ones of the same name saved in
+    ``baseline`` file and returns description of each which is slower more
+    than by ``tolerance`` (fraction of baseline median).
+    """
+    baseline_medians = {
+        result['name']: result['median']
+        for result in json.loads(baseline.read_text())['results']
+    }
+    regressions: list[str] = []
+    for result in results:
+        expected = baseline_medians.get(result['name'])
+        if expected is not None and result['median'] > expected * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f'{result["name"]}: {result["median"]:.3f}s, baseline is '
+                f'{expected:.3f}s',
+            )
+    return regressions
+
+
+def print_results(results: list[TResult], columns: t.Sequence[str] = ()):
+    """
+    Prints table of results with their medians, minimums and values of
+    ``columns`` of extra.
+    """
+    table = Table('Benchmark', 'Median', 'Min', *columns)
+    for column in table.columns[1:]:
+        column.justify = 'right'
+    for result in results:
+        table.add_row(
+            result['name'],
+            f'{result["median"]:.3f}s',
+            f'{result["min"]:.3f}s',
+            *(str(result['extra'].get(column, '')) for column in columns),
+        )
+    console.print(table)
+
+
+def check_regressions(
+    results: list[TResult],
+    baseline: Path | None,
+    tolerance: float,
+) -> bool:
+    """
+    Prints regressions against ``baseline`` if it is given and returns
+    whether there are none.
+    """
+    if baseline is None:
+        return True
+    regressions = find_regressions(results, baseline, tolerance)
+    for regression in regressions:
+        console.print(f'[red]Regression:[/red] {regression}')
+    return not regressions
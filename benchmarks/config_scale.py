@@ -0,0 +1,192 @@
+"""
+Measures loading, validation and saving of configs with many projects.
+
+    python -m benchmarks.config_scale --output results.json
+"""
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+import typer
+from config_keeper import config, settings
+from config_keeper.remotes import RemoteInfoCache
+from config_keeper.validation import ProjectValidator, RootValidator
+
+from benchmarks.common import (
+    Sandbox,
+    TResult,
+    check_regressions,
+    make_result,
+    print_results,
+    save_results,
+)
+
+cli = typer.Typer(add_completion=False)
+
+
+def generate_config(
+    sandbox: Sandbox,
+    projects: int,
+    paths: int,
+    repositories: int,
+) -> config.TConfig:
+    """
+    Returns config with ``projects`` projects having ``paths`` existing paths
+    each. Projects share ``repositories`` local bare repositories, so remote
+    checks do not depend on network.
+    """
+    urls = [
+        sandbox.create_repo(f'remote_{i}.git') for i in range(repositories)
+    ]
+    files_dir = sandbox.root / 'files'
+    files_dir.mkdir()
+    files: list[str] = []
+    for i in range(paths):
+        file = files_dir / f'file_{i}'
+        file.write_text('content')
+        files.append(str(file))
+    return {
+        'projects': {
+            f'project_{i}': {
+                'repository': urls[i % repositories],
+                'branch': 'main',
+                'paths': {
+                    f'path_{j}': file for j, file in enumerate(files)
+                },
+            }
+            for i in range(projects)
+        },
+    }
+
+
+def validate(conf: config.TConfig, jobs: int | None):
+    """
+    Validates config like "config validate" command does, checking each
+    repository once.
+    """
+    root_validator = RootValidator(conf)
+    project_validator = ProjectValidator(conf, remotes=RemoteInfoCache())
+    root_validator.validate()
+    project_validator.check_repositories(conf['projects'], jobs=jobs)
+    for project in conf['projects']:
+        project_validator.validate(project)
+    if not (root_validator.is_valid and project_validator.is_valid):
+        root_validator.print_errors()
+        project_validator.print_errors()
+        msg = 'generated config is not valid'
+        raise RuntimeError(msg)
+
+
+def measure(
+    func: t.Callable[[], object],
+    repeat: int,
+) -> tuple[list[float], int]:
+    """
+    Returns wall time of each of ``repeat`` calls of ``func`` and peak memory
+    allocated during one more call. Memory is traced separately, because
+    tracing slows the function down.
+    """
+    runs: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return runs, peak
+
+
+@cli.command()
+def main(
+    projects: t.Annotated[
+        t.List[int],  # noqa: UP006
+        typer.Option(
+            help='Number of projects in config. May be given multiple times.',
+        ),
+    ] = [10, 1000, 10000],  # noqa: B006
+    paths: t.Annotated[
+        int,
+        typer.Option(help='Number of paths of each project.'),
+    ] = 10,
+    repositories: t.Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help='Number of local repositories shared by projects.',
+        ),
+    ] = 10,
+    jobs: t.Annotated[
+        t.Optional[int],  # noqa: UP007
+        typer.Option(min=1, help='Threads to check repositories with.'),
+    ] = None,
+    repeat: t.Annotated[
+        int,
+        typer.Option(min=1, help='Number of runs of each benchmark.'),
+    ] = 3,
+    output: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help='Save results to this file as JSON.'),
+    ] = None,
+    baseline: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(
+            help='Fail if any median is slower than in these saved results.',
+        ),
+    ] = None,
+    tolerance: t.Annotated[
+        float,
+        typer.Option(help='Allowed slowdown against baseline as a fraction.'),
+    ] = 0.2,
+):
+    """
+    Measure time and peak memory of loading, validating and saving configs.
+    """
+    results: list[TResult] = []
+    config_file, data_dir = settings.CONFIG_FILE, settings.DATA_DIR
+    try:
+        for count in projects:
+            with Sandbox() as sandbox:
+                settings.CONFIG_FILE = sandbox.config_file
+                settings.DATA_DIR = sandbox.data_dir
+                conf = generate_config(sandbox, count, paths, repositories)
+                config.save(conf)
+                extra = {
+                    'projects': count,
+                    'paths': paths,
+                    'config_bytes': sandbox.config_file.stat().st_size,
+                }
+                operations: dict[str, t.Callable[[], object]] = {
+                    'load': config.load,
+                    'validate': lambda: validate(conf, jobs),  # noqa: B023
+                    'save': lambda: config.save(conf),  # noqa: B023
+                }
+                for operation, func in operations.items():
+                    runs, peak = measure(func, repeat)
+                    results.append(make_result(
+                        f'{count}/{operation}',
+                        runs,
+                        **extra,
+                        peak_memory=peak,
+                    ))
+    finally:
+        settings.CONFIG_FILE, settings.DATA_DIR = config_file, data_dir
+
+    print_results(results, columns=('config_bytes', 'peak_memory'))
+    if output:
+        save_results(output, 'config_scale', {
+            'paths': paths,
+            'repositories': repositories,
+            'jobs': jobs,
+            'repeat': repeat,
+        }, results)
+    if not check_regressions(results, baseline, tolerance):
+        raise typer.Exit(1)
+
+
+if __name__ == '__main__':
+    cli()
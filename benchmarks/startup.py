@@ -0,0 +1,214 @@
+"""
+Measures startup of the CLI and latency of shell completion, fails if any
+median exceeds its budget.
+
+    python -m benchmarks.startup --budget version=0.3 --output results.json
+"""
+import re
+import subprocess
+import sys
+import typing as t
+from pathlib import Path
+
+import typer
+
+from benchmarks.common import (
+    Sandbox,
+    TResult,
+    check_regressions,
+    console,
+    make_result,
+    print_results,
+    save_results,
+)
+
+cli = typer.Typer(add_completion=False)
+
+# seconds, generous enough for a slow CI machine
+DEFAULT_BUDGETS = {
+    'import': 0.5,
+    'version': 0.75,
+    'project-list': 1.0,
+    'complete-project': 1.0,
+    'complete-projects': 1.0,
+    'complete-path-names': 1.0,
+}
+
+# words typed before pressing tab for each completion callback
+COMPLETIONS = {
+    'complete-project': ['project', 'show', ''],
+    'complete-projects': ['push', ''],
+    'complete-path-names': ['paths', 'delete', '--project', 'project_0', ''],
+}
+
+importtime_regex = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.+)$',
+)
+
+
+class TImport(t.TypedDict):
+    module: str
+    self: float
+    cumulative: float
+
+
+def measure_import(module: str) -> tuple[float, list[TImport]]:
+    """
+    Imports ``module`` in a new interpreter with ``-X importtime``. Returns
+    cumulative import time of the module in seconds and every imported
+    module.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports: list[TImport] = []
+    for line in result.stderr.splitlines():
+        if match := importtime_regex.match(line):
+            imports.append({
+                'module': match['name'].strip(),
+                'self': int(match['self']) / 1e6,
+                'cumulative': int(match['cumulative']) / 1e6,
+            })
+    total = next(
+        imported['cumulative']
+        for imported in imports
+        if imported['module'] == module
+    )
+    return total, imports
+
+
+def complete(sandbox: Sandbox, words: list[str]) -> tuple[float, str]:
+    """
+    Runs completion of the last of ``words`` like bash does.
+    """
+    return sandbox.run([], env={
+        '_CONFIG_KEEPER_COMPLETE': 'complete_bash',
+        'COMP_WORDS': ' '.join(['config-keeper', *words]),
+        'COMP_CWORD': str(len(words)),
+    })
+
+
+def parse_budgets(values: list[str]) -> dict[str, float]:
+    budgets = dict(DEFAULT_BUDGETS)
+    for value in values:
+        name, sep, seconds = value.partition('=')
+        if not sep or name not in budgets:
+            choices = ', '.join(budgets)
+            msg = f'expected NAME=SECONDS, where NAME is one of {choices}'
+            raise typer.BadParameter(msg, param_hint='--budget')
+        budgets[name] = float(seconds)
+    return budgets
+
+
+@cli.command()
+def main(
+    budget: t.Annotated[
+        t.List[str],  # noqa: UP006
+        typer.Option(
+            help=(
+                'Override budget of a benchmark as NAME=SECONDS, e.g. '
+                'version=0.3. May be given multiple times.'
+            ),
+        ),
+    ] = [],  # noqa: B006
+    projects: t.Annotated[
+        int,
+        typer.Option(min=1, help='Number of projects in the config.'),
+    ] = 100,
+    paths: t.Annotated[
+        int,
+        typer.Option(help='Number of paths of each project.'),
+    ] = 10,
+    repeat: t.Annotated[
+        int,
+        typer.Option(min=1, help='Number of runs of each benchmark.'),
+    ] = 10,
+    output: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help='Save results to this file as JSON.'),
+    ] = None,
+    baseline: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(
+            help='Fail if any median is slower than in these saved results.',
+        ),
+    ] = None,
+    tolerance: t.Annotated[
+        float,
+        typer.Option(help='Allowed slowdown against baseline as a fraction.'),
+    ] = 0.2,
+):
+    """
+    Measure cold start of the CLI and shell completion in new processes.
+    """
+    budgets = parse_budgets(budget)
+    runs: dict[str, list[float]] = {name: [] for name in budgets}
+    imports: list[TImport] = []
+
+    with Sandbox() as sandbox:
+        sandbox.save_config({
+            'projects': {
+                f'project_{i}': {
+                    'repository': f'git@example.com:user/repo_{i}.git',
+                    'branch': 'main',
+                    'paths': {
+                        f'path_{j}': f'~/.config/app_{i}/file_{j}'
+                        for j in range(paths)
+                    },
+                }
+                for i in range(projects)
+            },
+        })
+        # the first run compiles modules, it is not what users usually see
+        sandbox.run(['--version'])
+
+        for _ in range(repeat):
+            seconds, imports = measure_import('config_keeper.commands')
+            runs['import'].append(seconds)
+            runs['version'].append(sandbox.run(['--version'])[0])
+            runs['project-list'].append(sandbox.run(['project', 'list'])[0])
+            for name, words in COMPLETIONS.items():
+                seconds, completions = complete(sandbox, words)
+                if not completions.strip():
+                    msg = f'{name} completed nothing'
+                    raise RuntimeError(msg)
+                runs[name].append(seconds)
+
+    results: list[TResult] = [
+        make_result(name, name_runs, budget=budgets[name])
+        for name, name_runs in runs.items()
+    ]
+    # the slowest imports help to find what regressed
+    results[0]['extra']['slowest_imports'] = sorted(
+        imports,
+        key=lambda imported: imported['self'],
+        reverse=True,
+    )[:20]
+    print_results(results, columns=('budget',))
+
+    if output:
+        save_results(output, 'startup', {
+            'projects': projects,
+            'paths': paths,
+            'repeat': repeat,
+        }, results)
+
+    over_budget = [
+        result for result in results
+        if result['median'] > result['extra']['budget']
+    ]
+    for result in over_budget:
+        console.print(
+            f'[red]Over budget:[/red] {result["name"]}: '
+            f'{result["median"]:.3f}s, budget is '
+            f'{result["extra"]["budget"]:.3f}s',
+        )
+    if over_budget or not check_regressions(results, baseline, tolerance):
+        raise typer.Exit(1)
+
+
+if __name__ == '__main__':
+    cli()
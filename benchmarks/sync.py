@@ -0,0 +1,250 @@
+"""
+Measures push and pull of synthetic projects into local bare repositories.
+
+    python -m benchmarks.sync --output results.json
+"""
+import enum
+import json
+import random
+import shutil
+import statistics
+import typing as t
+from pathlib import Path
+
+import typer
+from config_keeper.sync_handler import PullEngine, PushEngine
+
+from benchmarks.common import (
+    Sandbox,
+    TResult,
+    check_regressions,
+    make_result,
+    print_results,
+    save_results,
+)
+
+cli = typer.Typer(add_completion=False)
+
+
+class Scenario(str, enum.Enum):
+    TINY = 'tiny'
+    HUGE = 'huge'
+    DEEP = 'deep'
+
+
+class TProjectSize(t.TypedDict):
+    files: int
+    bytes: int
+
+
+OPERATIONS = ('push', 'push-unchanged', 'pull')
+
+
+def write_file(path: Path, size: int, rnd: random.Random):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(rnd.randbytes(size))
+
+
+def generate_tiny(root: Path, files: int, size: int, rnd: random.Random):
+    """
+    Many tiny files, 100 in each directory.
+    """
+    for i in range(files):
+        write_file(root / f'dir_{i // 100}' / f'file_{i}', size, rnd)
+
+
+def generate_huge(root: Path, files: int, size: int, rnd: random.Random):
+    """
+    Few huge files in the root.
+    """
+    for i in range(files):
+        write_file(root / f'file_{i}', size, rnd)
+
+
+def generate_deep(
+    root: Path,
+    depth: int,
+    files: int,
+    size: int,
+    rnd: random.Random,
+):
+    """
+    Chain of ``depth`` nested directories with ``files`` files in each.
+    """
+    directory = root
+    for level in range(depth):
+        directory /= f'level_{level}'
+        for i in range(files):
+            write_file(directory / f'file_{i}', size, rnd)
+
+
+def get_size(root: Path) -> TProjectSize:
+    files = [path for path in root.rglob('*') if path.is_file()]
+    return {
+        'files': len(files),
+        'bytes': sum(path.stat().st_size for path in files),
+    }
+
+
+def run_scenario(
+    generate: t.Callable[[Path, random.Random], None],
+    seed: int,
+    args: dict[str, list[str]],
+) -> tuple[dict[str, float], dict[str, dict[str, float]], TProjectSize]:
+    """
+    Pushes generated project into a new repository, pushes it once more
+    without changes and pulls it back into removed directory. ``args`` are
+    extra arguments of each command. Returns wall time of each operation,
+    times of their phases and size of the project.
+    """
+    with Sandbox() as sandbox:
+        project_dir = sandbox.root / 'project'
+        generate(project_dir, random.Random(seed))
+        size = get_size(project_dir)
+        sandbox.save_config({
+            'projects': {
+                'bench': {
+                    'repository': sandbox.create_repo('remote.git'),
+                    'branch': 'main',
+                    'paths': {'files': str(project_dir)},
+                },
+            },
+        })
+        timings_file = sandbox.root / 'timings.json'
+        times: dict[str, float] = {}
+        phases: dict[str, dict[str, float]] = {}
+        for operation in OPERATIONS:
+            if operation == 'pull':
+                shutil.rmtree(project_dir)
+            command = operation.removesuffix('-unchanged')
+            times[operation], _ = sandbox.run([
+                command,
+                'bench',
+                '--no-ask',
+                '--timings-file',
+                str(timings_file),
+                *args[command],
+            ])
+            phases[operation] = {
+                phase['phase']: phase['seconds']
+                for phase in json.loads(timings_file.read_text())['bench']
+            }
+        return times, phases, size
+
+
+@cli.command()
+def main(
+    scenarios: t.Annotated[
+        t.List[Scenario],  # noqa: UP006
+        typer.Option(
+            '--scenario',
+            help='Scenarios to run. Defaults to all of them.',
+        ),
+    ] = [],  # noqa: B006
+    tiny_files: int = 2000,
+    tiny_size: t.Annotated[
+        int,
+        typer.Option(help='Size of each tiny file in bytes.'),
+    ] = 256,
+    huge_files: int = 3,
+    huge_size: t.Annotated[
+        int,
+        typer.Option(help='Size of each huge file in bytes.'),
+    ] = 50_000_000,
+    deep_depth: int = 50,
+    deep_files: t.Annotated[
+        int,
+        typer.Option(help='Number of files at each level of deep tree.'),
+    ] = 20,
+    deep_size: int = 1024,
+    engine: PushEngine = PushEngine.WORKTREE,
+    pull_engine: PullEngine = PullEngine.WORKTREE,
+    repeat: t.Annotated[
+        int,
+        typer.Option(min=1, help='Number of runs of each scenario.'),
+    ] = 3,
+    seed: int = 0,
+    output: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help='Save results to this file as JSON.'),
+    ] = None,
+    baseline: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(
+            help='Fail if any median is slower than in these saved results.',
+        ),
+    ] = None,
+    tolerance: t.Annotated[
+        float,
+        typer.Option(help='Allowed slowdown against baseline as a fraction.'),
+    ] = 0.2,
+):
+    """
+    Measure push and pull of synthetic projects end-to-end and per phase.
+    """
+    generators: dict[Scenario, t.Callable[[Path, random.Random], None]] = {
+        Scenario.TINY: lambda root, rnd: generate_tiny(
+            root, tiny_files, tiny_size, rnd,
+        ),
+        Scenario.HUGE: lambda root, rnd: generate_huge(
+            root, huge_files, huge_size, rnd,
+        ),
+        Scenario.DEEP: lambda root, rnd: generate_deep(
+            root, deep_depth, deep_files, deep_size, rnd,
+        ),
+    }
+
+    results: list[TResult] = []
+    for scenario in scenarios or list(Scenario):
+        runs: dict[str, list[float]] = {op: [] for op in OPERATIONS}
+        phase_runs: dict[str, dict[str, list[float]]] = {
+            op: {} for op in OPERATIONS
+        }
+        size: TProjectSize = {'files': 0, 'bytes': 0}
+        for _ in range(repeat):
+            times, phases, size = run_scenario(
+                generators[scenario],
+                seed,
+                {
+                    'push': ['--engine', engine.value],
+                    'pull': ['--engine', pull_engine.value],
+                },
+            )
+            for operation, seconds in times.items():
+                runs[operation].append(seconds)
+                for phase, phase_seconds in phases[operation].items():
+                    phase_runs[operation].setdefault(phase, []).append(
+                        phase_seconds,
+                    )
+        for operation in OPERATIONS:
+            results.append(make_result(
+                f'{scenario.value}/{operation}',
+                runs[operation],
+                **size,
+                phases={
+                    phase: statistics.median(seconds)
+                    for phase, seconds in phase_runs[operation].items()
+                },
+            ))
+
+    print_results(results, columns=('files', 'bytes'))
+    if output:
+        save_results(output, 'sync', {
+            'tiny_files': tiny_files,
+            'tiny_size': tiny_size,
+            'huge_files': huge_files,
+            'huge_size': huge_size,
+            'deep_depth': deep_depth,
+            'deep_files': deep_files,
+            'deep_size': deep_size,
+            'engine': engine.value,
+            'pull_engine': pull_engine.value,
+            'repeat': repeat,
+            'seed': seed,
+        }, results)
+    if not check_regressions(results, baseline, tolerance):
+        raise typer.Exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -4,10 +4,25 @@ from pathlib import Path
 import typer
 
 # paths
-_DEFAULT_CONFIG_FILE = (
-    Path(typer.get_app_dir('config-keeper', roaming=False)) / 'config.yaml'
-)
+_APP_DIR = Path(typer.get_app_dir('config-keeper', roaming=False))
+_DEFAULT_CONFIG_FILE = _APP_DIR / 'config.yaml'
 CONFIG_FILE = Path(os.getenv('CONFIG_KEEPER_CONFIG_FILE', _DEFAULT_CONFIG_FILE))
+DATA_DIR = Path(os.getenv('CONFIG_KEEPER_DATA_DIR', _APP_DIR / 'data'))
+
+# remotes
+PING_TIMEOUT = float(os.getenv('CONFIG_KEEPER_PING_TIMEOUT', '30'))
+# seconds to reuse information about remotes between runs, 0 disables caching
+REMOTE_CACHE_TTL = float(os.getenv('CONFIG_KEEPER_REMOTE_CACHE_TTL', '0'))
+
+# git
+# "subprocess" runs git executable, "dulwich" performs most operations
+# in-process (requires dulwich package), overrides "git_backend" key of config
+GIT_BACKEND = os.getenv('CONFIG_KEEPER_GIT_BACKEND')
+
+# tracing
+# file to write trace of every run to, same as --trace option
+_TRACE_FILE = os.getenv('CONFIG_KEEPER_TRACE_FILE')
+TRACE_FILE = Path(_TRACE_FILE) if _TRACE_FILE else None
 
 # etc
 EXECUTABLE_NAME = 'config-keeper'
@@ -0,0 +1,462 @@
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import importlib.util
+import re
+import shutil
+import subprocess
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+from config_keeper import exceptions as exc
+from config_keeper import settings, tracing
+
+sha_regex = re.compile(r'^[0-9a-f]{40}$')
+
+
+class ProcessStats:
+    """
+    Number and total wall time of processes spawned while it is active (see
+    ``count_processes``).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        noun = 'process' if self.count == 1 else 'processes'
+        return f'{self.count} {noun} in {self.seconds:.2f}s'
+
+
+_process_stats: contextvars.ContextVar[ProcessStats | None] = (
+    contextvars.ContextVar('process_stats', default=None)
+)
+
+
+@contextlib.contextmanager
+def count_processes() -> t.Generator[ProcessStats, None, None]:
+    """
+    Counts processes spawned by the current thread inside the block.
+    """
+    stats = ProcessStats()
+    token = _process_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _process_stats.reset(token)
+
+
+def record_process(started: float, cmd: list[str]):
+    """
+    Counts and traces process which was started at ``started``
+    (``time.perf_counter`` value) and has just finished.
+    """
+    stats = _process_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+    tracing.record(get_process_name(cmd), 'process', started, cmd=cmd)
+
+
+def get_process_name(cmd: list[str]) -> str:
+    """
+    Returns executable name with subcommand, e.g. "git fetch" for
+    ``['/usr/bin/git', '-C', 'repo', 'fetch', 'origin']``.
+    """
+    name = Path(cmd[0]).name
+    args = iter(cmd[1:])
+    for arg in args:
+        if arg == '-C':
+            next(args, None)
+        elif not arg.startswith('-'):
+            return f'{name} {arg}'
+    return name  # nocv
+
+
+@functools.cache
+def get_executable(name: str) -> str:
+    executable = shutil.which(name)
+    if not executable:
+        raise exc.ExecutableNotFoundError(name)
+    return executable
+
+
+def run_cmd(
+    cmd: list[str],
+    stdin: str | None = None,
+) -> subprocess.CompletedProcess[str]:
+    cmd = [get_executable(cmd[0])] + cmd[1:]
+    started = time.perf_counter()
+    try:
+        return subprocess.run(
+            cmd,
+            check=True,
+            capture_output=True,
+            text=True,
+            input=stdin,
+        )
+    finally:
+        record_process(started, cmd)
+
+
+def get_output(result: subprocess.CompletedProcess[str]) -> str:
+    return result.stdout + result.stderr
+
+
+class BackendError(Exception):
+    pass
+
+
+class GitBackend:
+    """
+    Git operations which are performed on repositories while syncing. This
+    implementation runs git executable for each of them. Subclasses may
+    perform them in-process and fall back to this implementation for what
+    they do not support.
+
+    Errors are raised as ``subprocess.CalledProcessError`` regardless of
+    implementation, methods which write something return output to show in
+    verbose mode.
+    """
+
+    name = 'subprocess'
+
+    def init(self, path: Path, repository: str, *, mirror: bool = False) -> str:
+        """
+        Creates repository in existing empty ``path`` with ``repository`` as
+        "origin" remote. Mirror is a bare repository which fetches refs of
+        origin as they are.
+        """
+        output = get_output(run_cmd([
+            'git', 'init', *(['--bare'] if mirror else []), str(path),
+        ]))
+        # write the same as "git remote add" does without spawning it
+        git_dir = path if mirror else path / '.git'
+        url = (
+            repository.replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+        fetch = (
+            '+refs/*:refs/*' if mirror
+            else '+refs/heads/*:refs/remotes/origin/*'
+        )
+        with (git_dir / 'config').open('a') as f:
+            f.write(
+                '[remote "origin"]\n'
+                f'\turl = "{url}"\n'
+                f'\tfetch = {fetch}\n',
+            )
+        return output
+
+    def fetch(
+        self,
+        repo: Path,
+        ref: str,
+        *,
+        depth: int | None = None,
+        blobs: bool = True,
+    ) -> str:
+        """
+        Fetches ``ref`` (branch name or commit sha) from origin. If ``depth``
+        is given, history is truncated to that number of commits. Without
+        ``blobs`` only commits and trees are fetched, so result is available
+        as FETCH_HEAD.
+        """
+        args = [] if depth is None else [f'--depth={depth}']
+        if not blobs:
+            args.append('--filter=blob:none')
+        return get_output(run_cmd([
+            'git', '-C', str(repo), 'fetch', *args, 'origin', ref,
+        ]))
+
+    def ls_remote(self, repository: str, *, timeout: float) -> dict[str, str]:
+        """
+        Returns commit sha of each head of the repository keyed by branch
+        name.
+        """
+        cmd = ['git', 'ls-remote', '--heads', repository]
+        started = time.perf_counter()
+        try:
+            result = subprocess.run(
+                cmd,
+                check=True,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        finally:
+            record_process(started, cmd)
+        heads: dict[str, str] = {}
+        for line in result.stdout.splitlines():
+            sha, _, ref = line.partition('\t')
+            heads[ref.removeprefix('refs/heads/')] = sha
+        return heads
+
+    def stage(self, worktree: Path) -> str:
+        """
+        Makes the index match the working tree, including removed files.
+        """
+        return get_output(run_cmd(['git', '-C', str(worktree), 'add', '.']))
+
+    def commit(self, worktree: Path, message: str) -> tuple[str, str]:
+        """
+        Commits the index to the current branch. Returns sha of the commit and
+        output.
+        """
+        output = get_output(run_cmd([
+            'git', '-C', str(worktree), 'commit', '-m', message,
+        ]))
+        result = run_cmd(['git', '-C', str(worktree), 'rev-parse', 'HEAD'])
+        return result.stdout.strip(), output
+
+    def push(
+        self,
+        repo: Path,
+        repository: str,
+        commit: str,
+        branch: str,
+        *,
+        set_upstream: bool = False,
+        force: bool = False,
+    ) -> str:
+        """
+        Updates ``branch`` of ``repository`` to ``commit`` unless it is not a
+        fast-forward and ``force`` is not set. With ``set_upstream`` the local
+        branch of the same name must point to ``commit`` and it starts
+        tracking the remote one.
+        """
+        if set_upstream:
+            args = ['--set-upstream', repository, branch]
+        else:
+            refspec = f'{commit}:refs/heads/{branch}'
+            args = [repository, f'+{refspec}' if force else refspec]
+        return get_output(run_cmd(['git', '-C', str(repo), 'push', *args]))
+
+
+class DulwichBackend(GitBackend):
+    """
+    Performs operations in-process with dulwich, so no process is spawned for
+    them. Partial fetch is not supported by dulwich and is performed by git
+    executable.
+    """
+
+    name = 'dulwich'
+
+    def __init__(self):
+        if importlib.util.find_spec('dulwich') is None:
+            feature = f'{self.name} git backend'
+            raise exc.PackageNotFoundError(self.name, feature)
+
+    def init(self, path: Path, repository: str, *, mirror: bool = False) -> str:
+        from dulwich.repo import Repo
+
+        with _translate_errors('init'):
+            repo = Repo.init_bare(path) if mirror else Repo.init(path)
+            with repo:
+                config = repo.get_config()
+                section = (b'remote', b'origin')
+                config.set(section, b'url', repository.encode())
+                config.set(section, b'fetch', (
+                    b'+refs/*:refs/*' if mirror
+                    else b'+refs/heads/*:refs/remotes/origin/*'
+                ))
+                config.write_to_path()
+        return f'Initialized repository in {path}'
+
+    def fetch(
+        self,
+        repo: Path,
+        ref: str,
+        *,
+        depth: int | None = None,
+        blobs: bool = True,
+    ) -> str:
+        if not blobs:
+            return super().fetch(repo, ref, depth=depth, blobs=blobs)
+
+        from dulwich.client import get_transport_and_path
+        from dulwich.objects import ObjectID
+        from dulwich.refs import Ref
+        from dulwich.repo import Repo
+
+        branch_ref = Ref(f'refs/heads/{ref}'.encode())
+
+        def determine_wants(
+            refs: t.Mapping[Ref, ObjectID],
+            depth: int | None = None,
+        ) -> list[ObjectID]:
+            sha = refs.get(branch_ref)
+            if sha is None and sha_regex.match(ref):
+                sha = ObjectID(ref.encode())
+            if sha is None:
+                msg = f"couldn't find remote ref {ref}"
+                raise BackendError(msg)
+            return [sha]
+
+        with _translate_errors('fetch'), Repo(str(repo)) as r:
+            url = r.get_config().get((b'remote', b'origin'), b'url').decode()
+            client, path = get_transport_and_path(url)
+            result = client.fetch(
+                path,
+                r,
+                determine_wants=determine_wants,
+                depth=depth,
+            )
+            remote_sha = result.refs.get(branch_ref)
+            if remote_sha is not None:
+                r.refs[branch_ref] = remote_sha
+        return f'Fetched {ref} from {url}'
+
+    def ls_remote(self, repository: str, *, timeout: float) -> dict[str, str]:
+        """
+        Unlike git, dulwich has no timeout for every transport, so it is
+        called in a daemon thread which is abandoned if it does not respond
+        in ``timeout`` seconds.
+        """
+        from dulwich.porcelain import ls_remote
+
+        future: concurrent.futures.Future[dict[str, str]] = (
+            concurrent.futures.Future()
+        )
+
+        def run():
+            try:
+                result = ls_remote(repository)
+                future.set_result({
+                    ref.decode().removeprefix('refs/heads/'): sha.decode()
+                    for ref, sha in result.refs.items()
+                    if ref.startswith(b'refs/heads/') and sha is not None
+                })
+            except BaseException as e:  # noqa: BLE001
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        with _translate_errors('ls-remote'):
+            try:
+                return future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                cmd = ['dulwich', 'ls-remote', repository]
+                raise subprocess.TimeoutExpired(cmd, timeout) from None
+
+    def stage(self, worktree: Path) -> str:
+        from dulwich.porcelain import add
+
+        with _translate_errors('add'):
+            added, _ = add(str(worktree))
+        return '\n'.join(f'add {path}' for path in added)
+
+    def commit(self, worktree: Path, message: str) -> tuple[str, str]:
+        from dulwich.porcelain import commit
+
+        with _translate_errors('commit'):
+            sha = commit(str(worktree), message=message.encode()).decode()
+        return sha, f'Committed {sha}'
+
+    def push(
+        self,
+        repo: Path,
+        repository: str,
+        commit: str,
+        branch: str,
+        *,
+        set_upstream: bool = False,
+        force: bool = False,
+    ) -> str:
+        from dulwich.client import get_transport_and_path
+        from dulwich.graph import can_fast_forward
+        from dulwich.objects import ObjectID
+        from dulwich.refs import Ref
+        from dulwich.repo import Repo
+
+        branch_ref = Ref(f'refs/heads/{branch}'.encode())
+        new_sha = ObjectID(commit.encode())
+
+        with _translate_errors('push'), Repo(str(repo)) as r:
+
+            def update_refs(
+                refs: dict[Ref, ObjectID],
+            ) -> dict[Ref, ObjectID]:
+                old_sha = refs.get(branch_ref)
+                if old_sha is not None and not force:
+                    try:
+                        is_fast_forward = can_fast_forward(r, old_sha, new_sha)
+                    except KeyError:
+                        # remote branch has commits which we do not have
+                        is_fast_forward = False
+                    if not is_fast_forward:
+                        msg = f'{branch} -> {branch} (non-fast-forward)'
+                        raise BackendError(msg)
+                return {**refs, branch_ref: new_sha}
+
+            client, path = get_transport_and_path(repository)
+            client.send_pack(
+                path.encode(),
+                update_refs,
+                r.generate_pack_data,  # type: ignore[arg-type]
+            )
+        return f'{commit} -> {branch}'
+
+
+@contextlib.contextmanager
+def _translate_errors(operation: str) -> t.Generator[None, None, None]:
+    from dulwich.errors import GitProtocolError, NotGitRepository
+
+    try:
+        with tracing.span(f'dulwich {operation}', 'dulwich'):
+            yield
+    except (
+        GitProtocolError,
+        NotGitRepository,
+        BackendError,
+        KeyError,
+        OSError,
+    ) as e:
+        raise subprocess.CalledProcessError(
+            128,
+            ['dulwich', operation],
+            '',
+            f'error: {operation} failed: {e}',
+        ) from e
+
+
+BACKENDS: dict[str, type[GitBackend]] = {
+    GitBackend.name: GitBackend,
+    DulwichBackend.name: DulwichBackend,
+}
+
+
+DEFAULT_BACKEND = GitBackend.name
+
+# backend chosen by "git_backend" key of the loaded config
+_configured_backend: str | None = None
+
+
+def configure_backend(name: str | None):
+    """
+    Chooses backend set in config. ``settings.GIT_BACKEND`` (environment
+    variable) still takes precedence over it.
+    """
+    global _configured_backend  # noqa: PLW0603
+    _configured_backend = name
+
+
+def get_backend() -> GitBackend:
+    """
+    Returns git backend chosen by ``settings.GIT_BACKEND``, "git_backend" key
+    of the config or the default one.
+    """
+    name = settings.GIT_BACKEND or _configured_backend or DEFAULT_BACKEND
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        choices = ', '.join(f'"{name}"' for name in BACKENDS)
+        msg = f'unknown git backend "{name}".'
+        raise exc.InvalidConfigError(msg, tip=(
+            f'set "git_backend" in config or CONFIG_KEEPER_GIT_BACKEND '
+            f'environment variable to one of {choices}.'
+        ))
+    return backend_class()
@@ -1,5 +1,7 @@
-import importlib.metadata  # noqa: I001
+import functools  # noqa: I001
+import importlib.metadata
 import typing as t
+from pathlib import Path
 
 import typer
 
@@ -7,8 +9,11 @@ from config_keeper.commands.common import autocompletion, helps, sync
 from config_keeper.commands.config import cli as config_cli
 from config_keeper.commands.paths import cli as paths_cli
 from config_keeper.commands.project import cli as project_cli
-from config_keeper import config, settings
+from config_keeper import config, profiling, settings, tracing
 from config_keeper.output import console
+from config_keeper.profiling import ProfileMode
+from config_keeper.remotes import RemoteInfoCache
+from config_keeper.sync_handler import PullEngine, PushEngine
 
 cli = typer.Typer(
     name=settings.EXECUTABLE_NAME,
@@ -26,14 +31,84 @@ ask_help = """
 projects_help = """
     List of project names.
 """
+status_projects_help = """
+    List of project names. If not given, all projects are shown.
+"""
 ref_help = """
     Commit sha or branch name to operate with. Only available if specified
     exactly one project. If not given than project branch is used.
 """
+shallow_help = """
+    Fetch only the tip commit of the branch instead of its whole history.
+"""
+partial_help = """
+    Fetch only the tip commit and download only files of project paths,
+    bypassing the local mirror. Requires the server to support partial clone,
+    otherwise all files of the tip commit are downloaded.
+"""
+incremental_push_help = """
+    Write only files which differ from the branch instead of copying all
+    paths.
+"""
+incremental_pull_help = """
+    Write only files which differ from the pulled ones and remove extra ones
+    instead of replacing paths completely. Identical files are left untouched.
+"""
+link_help = """
+    Stage files by making hard links to them instead of copying. Files which
+    cannot be linked (e.g. they are on another filesystem than data directory)
+    are copied.
+"""
+engine_help = """
+    How to build the commit. "worktree" copies files into a temporary working
+    tree and commits them with "git add" and "git commit". "index" hashes files
+    straight into the repository and builds the commit with index plumbing
+    without copying or checking out any files. "fast-import" streams files
+    and the commit into a single "git fast-import" process, which is the
+    fastest way for many small files. --incremental and --link options are
+    used only by "worktree" engine.
+"""
+pull_engine_help = """
+    How to put files in places. "worktree" checks out files into a temporary
+    working tree and copies them. "cat-file" reads files straight from the
+    local mirror with a single "git cat-file" process and writes them directly
+    into places, so every file is written only once (--partial option is
+    ignored then).
+"""
+timings_help = """
+    Show wall time of each phase of the operation for every project, as well
+    as number and size of files written in it.
+"""
+timings_file_help = """
+    Save timings of phases (see --timings) as JSON to this file.
+"""
+trace_help = """
+    Write spans of the run (config loading, validation, every spawned process,
+    phases of operations and copying of each path) to this file in Chrome
+    trace event format. It can be opened with chrome://tracing, Perfetto UI or
+    Speedscope. Can also be set with CONFIG_KEEPER_TRACE_FILE environment
+    variable.
+"""
+profile_help = """
+    Run the command under profiler. "cpu" saves cProfile stats (pstats file)
+    and "mem" saves report of top memory allocations traced by tracemalloc.
+"""
+profile_file_help = """
+    File to save profile to (see --profile). Defaults to "config-keeper.prof"
+    for "cpu" and "config-keeper-mem.txt" for "mem" in the current directory.
+"""
+offline_help = """
+    Compare with repositories as they were fetched last time without
+    connecting to them, which is fast enough to run on every shell login.
+"""
+jobs_help = """
+    Number of projects to process concurrently. Defaults to the number of CPUs.
+"""
 
 
 @cli.callback(invoke_without_command=True)
-def print_version(
+def main(
+    ctx: typer.Context,
     version: t.Annotated[
         bool,
         typer.Option(
@@ -42,7 +117,30 @@ def print_version(
             is_eager=True,
         ),
     ] = False,
+    trace: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help=trace_help, dir_okay=False),
+    ] = None,
+    profile: t.Annotated[
+        t.Optional[ProfileMode],  # noqa: UP007
+        typer.Option(help=profile_help),
+    ] = None,
+    profile_file: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help=profile_file_help, dir_okay=False),
+    ] = None,
 ):
+    trace = trace or settings.TRACE_FILE
+    if trace:
+        tracing.start_tracing()
+        ctx.call_on_close(functools.partial(tracing.stop_tracing, trace))
+    if profile:
+        profiling.start_profiling(profile)
+        ctx.call_on_close(functools.partial(
+            profiling.stop_profiling,
+            profile_file or profiling.DEFAULT_FILES[profile],
+        ))
+
     if version:
         console.print(
             importlib.metadata.version('config-keeper2'),
@@ -69,6 +167,26 @@ def push(
         bool,
         typer.Option('--verbose', '-v', help=helps.verbose),
     ] = False,
+    jobs: t.Annotated[
+        t.Optional[int],  # noqa: UP007
+        typer.Option('--jobs', '-j', min=1, help=jobs_help),
+    ] = None,
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
+    shallow: t.Annotated[bool, typer.Option(help=shallow_help)] = False,
+    incremental: t.Annotated[
+        bool,
+        typer.Option(help=incremental_push_help),
+    ] = True,
+    link: t.Annotated[bool, typer.Option(help=link_help)] = False,
+    engine: t.Annotated[
+        PushEngine,
+        typer.Option(help=engine_help),
+    ] = PushEngine.WORKTREE,
+    timings: t.Annotated[bool, typer.Option(help=timings_help)] = False,
+    timings_file: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help=timings_file_help, dir_okay=False),
+    ] = None,
 ):
     """
     Push files or directories of projects to their repositories. This operation
@@ -78,14 +196,28 @@ def push(
 
     sync.check_options(projects, ask, ref)
     conf = config.load()
-    validator = sync.get_validator('push', conf)
-    sync.validate_projects(projects, validator)
+    remotes = RemoteInfoCache(use_disk_cache=cache)
+    validator = sync.get_validator('push', conf, remotes)
+    sync.validate_projects(projects, validator, jobs)
 
     if ref:
         conf['projects'][projects[0]]['branch'] = ref
 
     sync.handle_push_ask(projects, conf, ask=ask)
-    sync.operate('push', projects, conf, verbose)
+    sync.operate(
+        'push',
+        projects,
+        conf,
+        verbose,
+        jobs=jobs,
+        remotes=remotes,
+        shallow=shallow,
+        incremental=incremental,
+        link=link,
+        engine=engine,
+        timings=timings,
+        timings_file=timings_file,
+    )
 
 
 @cli.command()
@@ -106,6 +238,26 @@ def pull(
         bool,
         typer.Option('--verbose', '-v', help=helps.verbose),
     ] = False,
+    jobs: t.Annotated[
+        t.Optional[int],  # noqa: UP007
+        typer.Option('--jobs', '-j', min=1, help=jobs_help),
+    ] = None,
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
+    shallow: t.Annotated[bool, typer.Option(help=shallow_help)] = False,
+    partial: t.Annotated[bool, typer.Option(help=partial_help)] = False,
+    incremental: t.Annotated[
+        bool,
+        typer.Option(help=incremental_pull_help),
+    ] = True,
+    engine: t.Annotated[
+        PullEngine,
+        typer.Option(help=pull_engine_help),
+    ] = PullEngine.WORKTREE,
+    timings: t.Annotated[bool, typer.Option(help=timings_help)] = False,
+    timings_file: t.Annotated[
+        t.Optional[Path],  # noqa: UP007
+        typer.Option(help=timings_file_help, dir_okay=False),
+    ] = None,
 ):
     """
     Pull all files and directories of projects from their repositories and move
@@ -116,11 +268,70 @@ def pull(
 
     sync.check_options(projects, ask, ref)
     conf = config.load()
-    validator = sync.get_validator('pull', conf)
-    sync.validate_projects(projects, validator)
+    remotes = RemoteInfoCache(use_disk_cache=cache)
+    validator = sync.get_validator('pull', conf, remotes)
+    sync.validate_projects(projects, validator, jobs)
 
     if ref:
         conf['projects'][projects[0]]['branch'] = ref
 
     sync.handle_pull_ask(projects, conf, ask=ask)
-    sync.operate('pull', projects, conf, verbose)
+    sync.operate(
+        'pull',
+        projects,
+        conf,
+        verbose,
+        jobs=jobs,
+        remotes=remotes,
+        shallow=shallow,
+        partial=partial,
+        incremental=incremental,
+        pull_engine=engine,
+        timings=timings,
+        timings_file=timings_file,
+    )
+
+
+@cli.command()
+def status(
+    projects: t.Annotated[
+        t.Optional[t.List[str]],  # noqa: UP006, UP007
+        typer.Argument(
+            help=status_projects_help,
+            autocompletion=autocompletion.projects,
+            show_default=False,
+        ),
+    ] = None,
+    verbose: t.Annotated[
+        bool,
+        typer.Option('--verbose', '-v', help=helps.verbose),
+    ] = False,
+    jobs: t.Annotated[
+        t.Optional[int],  # noqa: UP007
+        typer.Option('--jobs', '-j', min=1, help=jobs_help),
+    ] = None,
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
+    offline: t.Annotated[bool, typer.Option(help=offline_help)] = False,
+):
+    """
+    Show state of paths of projects compared with their repositories: "in
+    sync", "local-modified", "remote-modified", "diverged" (modified on both
+    sides) or "missing" (exists only in the repository). Only the local mirror
+    of the repository is updated, files are not checked out. If a repository
+    is unavailable, its mirror is used as it is.
+    """
+
+    conf = config.load()
+    projects = projects or list(conf['projects'])
+    remotes = RemoteInfoCache(use_disk_cache=cache)
+    validator = sync.get_validator('status', conf, remotes, offline=offline)
+    sync.validate_projects(projects, validator, jobs)
+    sync.operate(
+        'status',
+        projects,
+        conf,
+        verbose,
+        jobs=jobs,
+        remotes=remotes,
+        offline=offline,
+    )
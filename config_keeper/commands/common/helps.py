@@ -11,3 +11,8 @@ branch = """
 check = """
     Whether to check if repository exist.
 """
+cache = """
+    Whether to reuse information about repositories cached by previous runs.
+    Caching is enabled by setting CONFIG_KEEPER_REMOTE_CACHE_TTL environment
+    variable to a number of seconds.
+"""
@@ -1,19 +1,23 @@
+import functools
+import os
 import subprocess
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import typer
+from rich.progress import Progress
 
 from config_keeper import config
 from config_keeper import exceptions as exc
 from config_keeper.output import console, format_panel_columns
 from config_keeper.progress import spinner
-from config_keeper.sync_handler import SyncHandler
+from config_keeper.remotes import RemoteInfoCache
+from config_keeper.sync_handler import PullEngine, PushEngine, SyncHandler
+from config_keeper.timings import format_timings_table, save_timings
 from config_keeper.validation import ProjectValidator, check_if_project_exists
 
-if t.TYPE_CHECKING:
-    from rich.progress import TaskID
-
-TOperation = t.Literal['push', 'pull']
+TOperation = t.Literal['push', 'pull', 'status']
 
 
 def check_options(
@@ -29,6 +33,9 @@ def check_options(
 def get_validator(
     operation: TOperation,
     conf: config.TConfig,
+    remotes: RemoteInfoCache | None = None,
+    *,
+    offline: bool = False,
 ) -> ProjectValidator:
     if operation == 'push':
         return ProjectValidator(
@@ -36,27 +43,40 @@ def get_validator(
             path_existence='error',
             not_copyable_path='error',
             not_writeable_path='skip',
+            remotes=remotes,
+        )
+    if operation == 'pull':
+        return ProjectValidator(
+            conf,
+            path_existence='skip',
+            not_copyable_path='skip',
+            not_writeable_path='error',
+            remotes=remotes,
         )
+    # status compares with the mirror if repository is unavailable
     return ProjectValidator(
         conf,
         path_existence='skip',
-        not_copyable_path='skip',
-        not_writeable_path='error',
+        repo_availability='skip' if offline else 'warning',
+        not_copyable_path='error',
+        not_writeable_path='skip',
+        remotes=remotes,
     )
 
 
 def validate_projects(
     projects: list[str],
     validator: ProjectValidator,
+    jobs: int | None = None,
 ):
     for project in projects:
         check_if_project_exists(project, validator.conf)
 
     with spinner() as s:
-        prev_task: TaskID | None = None
+        prev_task = s.add_task('Checking repositories...', total=None)
+        validator.check_repositories(projects, jobs=jobs)
         for project in projects:
-            if prev_task is not None:
-                s.stop_task(prev_task)
+            s.stop_task(prev_task)
             prev_task = s.add_task(
                 f'Validating project "{project}"...',
                 total=None,
@@ -99,44 +119,111 @@ def handle_pull_ask(projects: list[str], conf: config.TConfig, *, ask: bool):
         raise typer.Exit
 
 
+def get_default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
 def operate(
     operation: TOperation,
     projects: list[str],
     conf: config.TConfig,
     verbose: bool = False,
+    jobs: int | None = None,
+    remotes: RemoteInfoCache | None = None,
+    shallow: bool = False,
+    partial: bool = False,
+    incremental: bool = True,
+    link: bool = False,
+    engine: PushEngine = PushEngine.WORKTREE,
+    pull_engine: PullEngine = PullEngine.WORKTREE,
+    offline: bool = False,
+    timings: bool = False,
+    timings_file: Path | None = None,
 ):
     output: dict[str, str] = {}
     projects_with_errors: list[str] = []
 
-    with spinner() as s:
-        prev_task: TaskID | None = None
-        for project in projects:
-            if prev_task is not None:
-                s.stop_task(prev_task)
-            prev_task = s.add_task(
-                f'Processing project "{project}"...',
-                total=None,
+    with (
+        spinner() as s,
+        ThreadPoolExecutor(jobs or get_default_jobs()) as executor,
+    ):
+        handlers = [
+            SyncHandler(
+                project,
+                conf,
+                verbose_output=verbose,
+                remotes=remotes,
+                shallow=shallow,
+                partial=partial,
+                incremental=incremental,
+                link=link,
+                engine=engine,
+                pull_engine=pull_engine,
+                offline=offline,
             )
-            handler = SyncHandler(project, conf, verbose_output=verbose)
-            try:
-                getattr(handler, operation)()
-                output[f'[green]{project}[/green]'] = handler.get_output(
-                    verbose,
-                )
-            except subprocess.CalledProcessError as e:
+            for project in projects
+        ]
+        results = executor.map(
+            functools.partial(
+                _process,
+                operation,
+                progress=s,
+                verbose=verbose,
+            ),
+            handlers,
+        )
+        for project, (succeeded, project_output) in zip(
+            projects,
+            results,
+            strict=True,
+        ):
+            if succeeded:
+                output[f'[green]{project}[/green]'] = project_output
+            else:
                 projects_with_errors.append(project)
-                output[f'[red]{project}[/red]'] = (
-                    f'{handler.get_output(verbose)}\n'
-                    '[red]'
-                    f'{(e.stdout + e.stderr).strip()}'
-                    '[/red]'
-                ).strip()
+                output[f'[red]{project}[/red]'] = project_output
 
     console.print(format_panel_columns(output))
 
+    project_timings = {
+        handler.project: handler.timings for handler in handlers
+    }
+    if timings:
+        console.print(format_timings_table(project_timings))
+    if timings_file is not None:
+        save_timings(project_timings, timings_file)
+
     if projects_with_errors:
         projects_msg = ', '.join(f'"{p}"' for p in projects_with_errors)
         msg = f'operation did not succeeded for {projects_msg}.'
         raise exc.SyncError(msg)
 
     console.print('Operation [green]successfully[/green] completed.')
+
+
+def _process(
+    operation: TOperation,
+    handler: SyncHandler,
+    progress: Progress,
+    verbose: bool,
+) -> tuple[bool, str]:
+    """
+    Runs operation of a single project. Returns whether it succeeded and
+    output of the project.
+    """
+    task = progress.add_task(
+        f'Processing project "{handler.project}"...',
+        total=None,
+    )
+    try:
+        getattr(handler, operation)()
+    except subprocess.CalledProcessError as e:
+        return False, (
+            f'{handler.get_output(verbose)}\n'
+            '[red]'
+            f'{(e.stdout + e.stderr).strip()}'
+            '[/red]'
+        ).strip()
+    finally:
+        progress.stop_task(task)
+    return True, handler.get_output(verbose)
@@ -1,9 +1,13 @@
+import typing as t
+
 import typer
 
 from config_keeper import config, settings
 from config_keeper import exceptions as exc
+from config_keeper.commands.common import helps
 from config_keeper.output import console
 from config_keeper.progress import spinner
+from config_keeper.remotes import RemoteInfoCache
 from config_keeper.validation import ProjectValidator, RootValidator
 
 cli = typer.Typer()
@@ -21,7 +25,9 @@ def path():
 
 
 @cli.command()
-def validate():
+def validate(
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
+):
     """
     Validate config for missing or unknown params, check repositories and paths.
     """
@@ -37,7 +43,12 @@ def validate():
         is_valid = root_validator.validate()
         has_warnings = root_validator.has_warnings
 
-        project_validator = ProjectValidator(conf, path_existence='warning')
+        project_validator = ProjectValidator(
+            conf,
+            path_existence='warning',
+            remotes=RemoteInfoCache(use_disk_cache=cache),
+        )
+        project_validator.check_repositories(conf['projects'])
         for project in conf['projects']:
             project_validator.validate(project)
             is_valid = is_valid and project_validator.is_valid
@@ -1,4 +1,3 @@
-import subprocess
 import typing as t
 
 import typer
@@ -9,7 +8,8 @@ from config_keeper import config, settings
 from config_keeper import exceptions as exc
 from config_keeper.commands.common import autocompletion, helps
 from config_keeper.output import console, print_error, print_project_saved
-from config_keeper.validation import check_if_project_exists, ping_remote
+from config_keeper.remotes import RemoteInfoCache
+from config_keeper.validation import check_if_project_exists
 
 cli = typer.Typer()
 
@@ -26,13 +26,14 @@ def create(
         typer.Option(prompt=True, help=helps.branch),
     ] = 'main',
     check: t.Annotated[bool, typer.Option(help=helps.check)] = True,
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
 ):
     """
     Create a new project.
     """
 
     if check:
-        _check_remote(repository)
+        _check_remote(repository, use_cache=cache)
 
     conf = config.load()
 
@@ -69,6 +70,7 @@ def update(
         typer.Option(help=helps.branch),
     ] = None,
     check: t.Annotated[bool, typer.Option(help=helps.check)] = True,
+    cache: t.Annotated[bool, typer.Option(help=helps.cache)] = True,
 ):
     """
     Update project.
@@ -82,7 +84,7 @@ def update(
 
     if repository:
         if check:
-            _check_remote(repository)
+            _check_remote(repository, use_cache=cache)
         data['repository'] = repository
         updated = True
 
@@ -209,16 +211,15 @@ def rename(
     print_project_saved(new_project)
 
 
-def _check_remote(repository: str):
+def _check_remote(repository: str, *, use_cache: bool):
     msg = f'Checking {repository}...'
     console.print(msg)
-    try:
-        ping_remote(repository, capture=True)
+    info = RemoteInfoCache(use_disk_cache=use_cache).get(repository)
+    if info.available:
         console.control(Control.move(y=-1, x=len(msg)+1))
         console.print('OK', style='green')
-    except subprocess.CalledProcessError as exc:
-        msg = exc.stdout + exc.stderr
-        msg = '\n    ' + msg.replace('\n', '\n    ')
-        print_error(msg)
-        if not typer.confirm('Do you want to continue?'):
-            raise typer.Exit from exc
+        return
+    msg = '\n    ' + info.details.replace('\n', '\n    ')
+    print_error(msg)
+    if not typer.confirm('Do you want to continue?'):
+        raise typer.Exit
@@ -2,8 +2,8 @@ import typing as t
 
 import yaml
 
+from config_keeper import backends, settings, tracing
 from config_keeper import exceptions as exc
-from config_keeper import settings
 
 
 class TProjectBound(t.TypedDict):
@@ -17,6 +17,7 @@ TProject = TProjectBound | dict[str, t.Any]
 
 class TConfigBound(t.TypedDict):
     projects: dict[str, TProject]
+    git_backend: t.NotRequired[str]
 
 
 TConfig = TConfigBound | dict[str, t.Any]
@@ -24,7 +25,8 @@ TConfig = TConfigBound | dict[str, t.Any]
 
 def populate_defaults(config: dict[str, t.Any]):
     for key, type_ in TConfigBound.__annotations__.items():
-        config.setdefault(key, type_())
+        if key not in TConfigBound.__optional_keys__:
+            config.setdefault(key, type_())
 
 
 def ensure_exists():
@@ -35,6 +37,7 @@ def ensure_exists():
         raise exc.PublicError(str(e)) from e
 
 
+@tracing.traced('config')
 def load() -> TConfig:
     ensure_exists()
     try:
@@ -78,9 +81,11 @@ def load() -> TConfig:
     if not is_valid:
         raise exc.InvalidConfigError
 
+    backends.configure_backend(t.cast(TConfig, config).get('git_backend'))
     return config
 
 
+@tracing.traced('config')
 def save(config: TConfig):
     raw = yaml.dump(config)
     settings.CONFIG_FILE.write_text(raw)
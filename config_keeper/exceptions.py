@@ -103,3 +103,14 @@ class ExecutableNotFoundError(PublicError):
             f'executable "{executable}" is not found in your system. '
             f'It is required for {settings.EXECUTABLE_NAME} to work correctly.',
         )
+
+
+class PackageNotFoundError(PublicError):
+    exit_code = 253
+
+    def __init__(self, package: str, feature: str):
+        super().__init__(
+            f'package "{package}" is not installed. It is required for '
+            f'{feature}.',
+            tip=f'install it with\n> pip install {package}',
+        )
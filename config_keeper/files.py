@@ -0,0 +1,329 @@
+import collections
+import errno
+import fcntl
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import typing as t
+from pathlib import Path
+
+TCompare = t.Callable[[Path, Path], bool]
+TCopy = t.Callable[[Path, Path], str]
+TCopyContent = t.Callable[[t.BinaryIO, t.BinaryIO, int], None]
+
+# linux ioctl which makes destination file share extents with source file
+FICLONE = 0x40049409
+
+# errors which mean that the strategy is not supported for these files, so
+# next one should be tried
+UNSUPPORTED_ERRNOS = frozenset((
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSOCK,
+    errno.ENOTSUP,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EPERM,
+    errno.EXDEV,
+))
+
+
+class CopyStats:
+    def __init__(self):
+        self.added = 0
+        self.changed = 0
+        self.deleted = 0
+        self.unchanged = 0
+        # size of written files
+        self.bytes = 0
+        self.strategies: collections.Counter[str] = collections.Counter()
+
+    def __str__(self) -> str:
+        return (
+            f'{self.added} added, {self.changed} changed, '
+            f'{self.deleted} deleted, {self.unchanged} unchanged'
+        )
+
+
+def format_strategies(strategies: collections.Counter[str]) -> str:
+    return ', '.join(
+        f'{count} {"file" if count == 1 else "files"} using {strategy}'
+        for strategy, count in strategies.most_common()
+    )
+
+
+def _reflink(source: t.BinaryIO, dest: t.BinaryIO, size: int):
+    fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+
+
+def _copy_file_range(source: t.BinaryIO, dest: t.BinaryIO, size: int):
+    copied = 0
+    while copied < size:
+        count = os.copy_file_range(
+            source.fileno(),
+            dest.fileno(),
+            size - copied,
+        )
+        if not count:
+            _check_copied_anything('copy_file_range', copied)
+            # file has been truncated in the meantime
+            break  # nocv
+        copied += count
+
+
+def _sendfile(source: t.BinaryIO, dest: t.BinaryIO, size: int):
+    copied = 0
+    while copied < size:
+        count = os.sendfile(
+            dest.fileno(),
+            source.fileno(),
+            copied,
+            size - copied,
+        )
+        if not count:
+            _check_copied_anything('sendfile', copied)
+            # file has been truncated in the meantime
+            break  # nocv
+        copied += count
+
+
+def _check_copied_anything(strategy: str, copied: int):
+    # some filesystems (procfs, sysfs, some FUSE ones) report nothing copied
+    # for files which are not empty, content must be read as usual then
+    if not copied:
+        msg = f'{strategy} copied nothing'
+        raise OSError(errno.ENOTSUP, msg)
+
+
+FAST_COPY_STRATEGIES: dict[str, TCopyContent] = {}
+# FICLONE and copying files with sendfile are linux-only, copy_file_range
+# is missing on other platforms too
+if sys.platform == 'linux':
+    FAST_COPY_STRATEGIES['reflink'] = _reflink
+if hasattr(os, 'copy_file_range'):
+    FAST_COPY_STRATEGIES['copy_file_range'] = _copy_file_range
+if sys.platform == 'linux':
+    FAST_COPY_STRATEGIES['sendfile'] = _sendfile
+
+# strategies which turned out to be unsupported for pairs of devices
+_unsupported_strategies: set[tuple[str, int, int]] = set()
+
+
+def copy_file(source: Path, dest: Path) -> str:
+    """
+    Copies content and metadata of the file like ``shutil.copy2`` does, but
+    uses the cheapest strategy supported by filesystems: reflink (copy on
+    write), then ``copy_file_range`` and ``sendfile`` which copy data inside
+    the kernel, then plain read and write. Strategies which fail are not tried
+    again for the same pair of devices. Returns name of the used strategy.
+    """
+    with source.open('rb') as src, dest.open('wb') as dst:
+        strategy = _copy_content(src, dst)
+    shutil.copystat(source, dest)
+    return strategy
+
+
+def link_file(source: Path, dest: Path) -> str:
+    """
+    Makes ``dest`` a hard link to ``source``, so nothing is copied at all.
+    Falls back to ``copy_file`` if it is not possible, e.g. files are on
+    different devices. Linked ``dest`` must only be read, because writing it
+    changes ``source`` too. Returns name of the used strategy.
+    """
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError as e:
+        if e.errno not in UNSUPPORTED_ERRNOS | {errno.EMLINK}:
+            raise
+        return copy_file(source, dest)
+    return 'hardlink'
+
+
+def _copy_content(source: t.BinaryIO, dest: t.BinaryIO) -> str:
+    size = os.fstat(source.fileno()).st_size
+    devices = (os.fstat(source.fileno()).st_dev, os.fstat(dest.fileno()).st_dev)
+    for strategy, copy_content in FAST_COPY_STRATEGIES.items():
+        if (strategy, *devices) in _unsupported_strategies:
+            continue
+        try:
+            copy_content(source, dest, size)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            _unsupported_strategies.add((strategy, *devices))
+            source.seek(0)
+            dest.seek(0)
+            dest.truncate()
+        else:
+            return strategy
+    shutil.copyfileobj(source, dest)
+    return 'read/write'
+
+
+def copy_path(
+    source: Path,
+    dest: Path,
+    stats: CopyStats | None = None,
+    *,
+    copy: TCopy = copy_file,
+) -> CopyStats:
+    """
+    Copies file or the whole directory like ``shutil.copy2`` and
+    ``shutil.copytree`` do, but with ``copy`` (``copy_file`` by default).
+    """
+    stats = stats or CopyStats()
+
+    def copy_function(src: str, dst: str) -> str:
+        stats.strategies[copy(Path(src), Path(dst))] += 1
+        stats.added += 1
+        stats.bytes += Path(dst).stat().st_size
+        return dst
+
+    if source.is_dir():
+        shutil.copytree(source, dest, copy_function=copy_function)
+    else:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        copy_function(str(source), str(dest))
+    return stats
+
+
+def remove_path(path: Path):
+    """
+    Removes file, symlink or the whole directory.
+    """
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def files_differ(first: Path, second: Path) -> bool:
+    """
+    Compares files by size and modification time first and reads their
+    contents only if it is not enough to tell.
+    """
+    first_stat = first.stat()
+    second_stat = second.stat()
+    if first_stat.st_size != second_stat.st_size:
+        return True
+    if first_stat.st_mtime_ns == second_stat.st_mtime_ns:
+        return False
+    return not filecmp.cmp(first, second, shallow=False)
+
+
+def write_atomically(path: Path, text: str):
+    """
+    Replaces file atomically, so concurrent readers never see it partially
+    written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    Path(temp_file).replace(path)
+
+
+def executable_bits_differ(first: Path, second: Path) -> bool:
+    return bool((first.stat().st_mode ^ second.stat().st_mode) & 0o111)
+
+
+def sync_path(
+    source: Path,
+    dest: Path,
+    stats: CopyStats | None = None,
+    *,
+    compare: TCompare = files_differ,
+    copy: TCopy = copy_file,
+) -> CopyStats:
+    """
+    Makes ``dest`` identical to ``source`` (file or directory) by writing only
+    added or changed files and removing extra ones. Identical files are left
+    untouched. ``compare`` tells whether contents of two existing files
+    differ and ``copy`` writes a file.
+    """
+    stats = stats or CopyStats()
+
+    if dest.is_symlink():
+        # never write through symlinks
+        dest.unlink()
+        stats.deleted += 1
+
+    if source.is_dir():
+        _sync_dir(source, dest, stats, compare, copy)
+    else:
+        _sync_file(source, dest, stats, compare, copy)
+    return stats
+
+
+def _sync_dir(
+    source: Path,
+    dest: Path,
+    stats: CopyStats,
+    compare: TCompare,
+    copy: TCopy,
+):
+    if dest.exists() and not dest.is_dir():
+        dest.unlink()
+        stats.deleted += 1
+    dest.mkdir(parents=True, exist_ok=True)
+
+    source_names: set[str] = set()
+    with os.scandir(source) as entries:
+        for entry in entries:
+            source_names.add(entry.name)
+            sync_path(
+                Path(entry.path),
+                dest / entry.name,
+                stats,
+                compare=compare,
+                copy=copy,
+            )
+    with os.scandir(dest) as entries:
+        for entry in entries:
+            if entry.name not in source_names:
+                remove_path(Path(entry.path))
+                stats.deleted += 1
+
+
+def _sync_file(
+    source: Path,
+    dest: Path,
+    stats: CopyStats,
+    compare: TCompare,
+    copy: TCopy,
+):
+    if dest.is_dir():
+        shutil.rmtree(dest)
+        stats.deleted += 1
+
+    if not dest.exists():
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        stats.strategies[copy(source, dest)] += 1
+        stats.added += 1
+        stats.bytes += dest.stat().st_size
+    elif compare(source, dest):
+        # copy to sibling file first, so destination is replaced instead of
+        # being opened for writing, which fails if it is read-only
+        fd, staging_file = tempfile.mkstemp(
+            dir=dest.parent,
+            prefix=f'.{dest.name}.',
+        )
+        os.close(fd)
+        try:
+            stats.strategies[copy(source, Path(staging_file))] += 1
+            Path(staging_file).replace(dest)
+        except BaseException:
+            Path(staging_file).unlink(missing_ok=True)
+            raise
+        stats.changed += 1
+        stats.bytes += dest.stat().st_size
+    elif executable_bits_differ(source, dest):
+        shutil.copymode(source, dest)
+        stats.changed += 1
+    else:
+        stats.unchanged += 1
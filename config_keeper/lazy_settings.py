@@ -5,7 +5,12 @@ from pathlib import Path
 
 class LazySettings:
     CONFIG_FILE: Path
+    DATA_DIR: Path
     EXECUTABLE_NAME: str
+    GIT_BACKEND: str | None
+    PING_TIMEOUT: float
+    REMOTE_CACHE_TTL: float
+    TRACE_FILE: Path | None
 
     def __init__(self, settings_module: str):
         _super = super()
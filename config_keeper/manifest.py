@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import stat
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+from config_keeper import settings
+from config_keeper.files import write_atomically
+
+# files modified so recently may be modified again without changing their
+# size and modification time (see "racy git" problem), so they are never
+# trusted
+RACY_INTERVAL_NS = 2 * 10**9
+
+
+class TManifestEntry(t.TypedDict):
+    size: int
+    mtime_ns: int
+    ctime_ns: int
+    dev: int
+    ino: int
+    blob: str
+
+
+class TStoredManifest(t.TypedDict):
+    synced: dict[str, str] | None
+    files: dict[str, TManifestEntry]
+
+
+def get_manifest_file(project: str) -> Path:
+    key = hashlib.sha1(project.encode()).hexdigest()
+    return settings.DATA_DIR / 'manifests' / f'{key}.json'
+
+
+def hash_file(path: Path, size: int | None = None) -> str:
+    """
+    Returns id of the file as a git blob, i.e. the same value which
+    ``git hash-object`` returns.
+    """
+    if size is None:
+        size = path.stat().st_size
+    sha = hashlib.sha1(f'blob {size}\0'.encode())
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class Manifest:
+    """
+    Persistent per-project cache of blob ids of local files keyed by their
+    absolute paths. Like git index, it remembers size, modification and
+    status change times, device and inode of each file, so unchanged files are
+    recognised without reading them. Status change time can not be set by
+    tools which restore modification time after writing a file.
+
+    Only entries used since the manifest was loaded are saved, so entries of
+    removed files do not pile up. If it was not consulted at all (e.g. files
+    were synced without comparing them), all loaded entries are kept.
+
+    ``synced`` maps path names of the project to ids of git objects (blobs or
+    trees) they had when the project was pushed or pulled last time.
+    """
+
+    def __init__(
+        self,
+        project: str,
+        entries: dict[str, TManifestEntry] | None = None,
+        synced: dict[str, str] | None = None,
+    ):
+        self.project = project
+        self.synced = synced
+        self._entries = entries or {}
+        self._used_entries: dict[str, TManifestEntry] = {}
+        self._consulted = False
+        self._lock = threading.Lock()
+
+    def save(self):
+        stored: TStoredManifest = {
+            'synced': self.synced,
+            'files': self._used_entries if self._consulted else self._entries,
+        }
+        write_atomically(get_manifest_file(self.project), json.dumps(stored))
+
+    def get_blob_id(self, path: Path) -> str:
+        """
+        Returns git blob id of the file, reading it only if it has changed
+        since it was hashed last time.
+        """
+        key = str(path)
+        stat = path.stat()
+        with self._lock:
+            self._consulted = True
+            entry = self._entries.get(key)
+        if entry is None or not self._matches(entry, stat):
+            entry = TManifestEntry(
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                ctime_ns=stat.st_ctime_ns,
+                dev=stat.st_dev,
+                ino=stat.st_ino,
+                blob=hash_file(path, stat.st_size),
+            )
+            if time.time_ns() - stat.st_mtime_ns < RACY_INTERVAL_NS:
+                return entry['blob']
+        with self._lock:
+            self._entries[key] = entry
+            self._used_entries[key] = entry
+        return entry['blob']
+
+    def get_object_id(self, path: Path) -> str | None:
+        """
+        Returns id of the file or directory as a git object, i.e. the same id
+        it would have if it was committed. Returns ``None`` for directories
+        without files because git does not store them.
+        """
+        if not path.is_dir():
+            return self.get_blob_id(path)
+
+        entries: list[tuple[bytes, bytes]] = []
+        with os.scandir(path) as it:
+            for entry in it:
+                child = Path(entry.path)
+                name = os.fsencode(entry.name)
+                if child.is_dir():
+                    object_id = self.get_object_id(child)
+                    if object_id is None:
+                        continue
+                    # git sorts trees as if their names ended with slash
+                    sort_key, mode = name + b'/', b'40000'
+                else:
+                    object_id = self.get_blob_id(child)
+                    is_executable = child.stat().st_mode & stat.S_IXUSR
+                    sort_key = name
+                    mode = b'100755' if is_executable else b'100644'
+                entries.append((
+                    sort_key,
+                    mode + b' ' + name + b'\0' + bytes.fromhex(object_id),
+                ))
+        if not entries:
+            return None
+
+        body = b''.join(entry for _, entry in sorted(entries))
+        return hashlib.sha1(b'tree %d\0' % len(body) + body).hexdigest()
+
+    @staticmethod
+    def _matches(entry: TManifestEntry, stat: os.stat_result) -> bool:
+        try:
+            return (
+                entry['size'] == stat.st_size
+                and entry['mtime_ns'] == stat.st_mtime_ns
+                and entry['ctime_ns'] == stat.st_ctime_ns
+                and entry['dev'] == stat.st_dev
+                and entry['ino'] == stat.st_ino
+                and 'blob' in entry
+            )
+        except (KeyError, TypeError):
+            # manifest was modified by hand
+            return False
+
+
+def load_manifest(project: str) -> Manifest:
+    """
+    Reads manifest of the project saved by previous runs. Unreadable or broken
+    manifest is treated as empty.
+    """
+    try:
+        stored = json.loads(get_manifest_file(project).read_text())
+    except (OSError, ValueError):
+        return Manifest(project)
+    if not isinstance(stored, dict):
+        return Manifest(project)
+    entries = t.cast(dict[str, t.Any], stored).get('files')
+    synced = t.cast(dict[str, t.Any], stored).get('synced')
+    return Manifest(
+        project,
+        t.cast(dict[str, TManifestEntry], entries)
+        if isinstance(entries, dict) else None,
+        t.cast(dict[str, str], synced) if isinstance(synced, dict) else None,
+    )
@@ -0,0 +1,106 @@
+import cProfile
+import enum
+import pstats
+import sys
+import threading
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+from rich.filesize import decimal
+
+from config_keeper.output import errconsole
+
+TOP_ALLOCATIONS = 25
+
+
+class ProfileMode(str, enum.Enum):
+    CPU = 'cpu'
+    MEM = 'mem'
+
+
+DEFAULT_FILES = {
+    ProfileMode.CPU: Path('config-keeper.prof'),
+    ProfileMode.MEM: Path('config-keeper-mem.txt'),
+}
+
+_stop: t.Callable[[Path], None] | None = None
+
+
+def start_profiling(mode: ProfileMode):
+    global _stop  # noqa: PLW0603
+    _stop = _start_cpu() if mode is ProfileMode.CPU else _start_memory()
+
+
+def stop_profiling(path: Path):
+    """
+    Writes profile to ``path`` and stops profiling.
+    """
+    global _stop  # noqa: PLW0603
+    if _stop is not None:
+        _stop(path)
+        _stop = None
+        errconsole.print(f'Profile saved to {path}.')
+
+
+def _start_cpu() -> t.Callable[[Path], None]:
+    """
+    Profiles the current thread and every thread started after with cProfile.
+    Result is saved as a pstats file, which can be read with ``pstats`` module
+    or tools like snakeviz.
+    """
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(*args: t.Any):  # nocv
+        # called on the first event of a new thread, profiler replaces itself
+        # (not seen by coverage as it is called by the interpreter as a hook)
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    # since 3.12 profiler is based on sys.monitoring, which covers all threads
+    # and allows only one active profiler
+    per_thread = sys.version_info < (3, 12)
+
+    def stop(path: Path):
+        if per_thread:
+            threading.setprofile(None)
+        profilers[0].disable()
+        with lock:
+            pstats.Stats(*profilers).dump_stats(path)
+
+    if per_thread:
+        threading.setprofile(profile_thread)
+    profilers[0].enable()
+    return stop
+
+
+def _start_memory() -> t.Callable[[Path], None]:
+    """
+    Traces memory allocations of all threads with tracemalloc. Result is saved
+    as a text report with current and peak traced memory and lines which
+    allocated most of memory which is still in use.
+    """
+
+    def stop(path: Path):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [
+            f'Current: {decimal(current)}, peak: {decimal(peak)}',
+            '',
+            f'Top {TOP_ALLOCATIONS} allocations:',
+        ]
+        for i, stat in enumerate(
+            snapshot.statistics('lineno')[:TOP_ALLOCATIONS],
+            start=1,
+        ):
+            lines.append(f'{i}. {stat}')
+        path.write_text('\n'.join(lines) + '\n')
+
+    tracemalloc.start()
+    return stop
@@ -0,0 +1,200 @@
+import json
+import subprocess
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config_keeper import settings
+from config_keeper.backends import get_backend
+from config_keeper.files import write_atomically
+
+
+class TStoredRemoteInfo(t.TypedDict):
+    checked_at: float
+    heads: dict[str, str]
+
+
+class RemoteInfo:
+    def __init__(
+        self,
+        repository: str,
+        heads: dict[str, str] | None = None,
+        *,
+        error: str | None = None,
+        details: str = '',
+        checked_at: float | None = None,
+        cached: bool = False,
+    ):
+        self.repository = repository
+        self.heads = heads or {}
+        self.error = error
+        self.details = details
+        self.checked_at = time.time() if checked_at is None else checked_at
+        self.cached = cached
+
+    @property
+    def available(self) -> bool:
+        return self.error is None
+
+    def get_head(self, branch: str) -> str | None:
+        """
+        Returns commit sha of the remote branch or ``None`` if it does not
+        exist (or remote is unavailable).
+        """
+        return self.heads.get(branch)
+
+
+def ls_remote(repository: str) -> RemoteInfo:
+    """
+    Lists heads of the repository using single ``git ls-remote`` call (or its
+    equivalent of the configured git backend).
+    """
+    try:
+        heads = get_backend().ls_remote(
+            repository,
+            timeout=settings.PING_TIMEOUT,
+        )
+    except subprocess.CalledProcessError as e:
+        return RemoteInfo(
+            repository,
+            error='unavailable',
+            details=(e.stdout + e.stderr).strip(),
+        )
+    except subprocess.TimeoutExpired:
+        reason = f'no response in {settings.PING_TIMEOUT:g} seconds'
+        return RemoteInfo(
+            repository,
+            error=f'unavailable ({reason})',
+            details=reason,
+        )
+    return RemoteInfo(repository, heads)
+
+
+def get_cache_file() -> Path:
+    return settings.DATA_DIR / 'remotes.json'
+
+
+def load_stored_infos() -> dict[str, TStoredRemoteInfo]:
+    """
+    Reads remote information saved by previous runs. Unreadable or broken
+    cache file is treated as empty.
+    """
+    try:
+        stored = json.loads(get_cache_file().read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(stored, dict):
+        return {}
+    return t.cast(dict[str, TStoredRemoteInfo], stored)
+
+
+def save_stored_infos(stored: dict[str, TStoredRemoteInfo]):
+    """
+    Atomically replaces cache file, so concurrent runs never see it partially
+    written.
+    """
+    write_atomically(get_cache_file(), json.dumps(stored))
+
+
+class RemoteInfoCache:
+    """
+    Run-scoped cache of remote information. Performs at most one
+    ``git ls-remote`` per repository, even if it is requested from several
+    threads at once.
+
+    If ``use_disk_cache`` is set and ``settings.REMOTE_CACHE_TTL`` is positive,
+    information about available repositories is also saved to data directory
+    and reused by next runs until it expires.
+    """
+
+    _disk_lock = threading.Lock()
+
+    def __init__(self, *, use_disk_cache: bool = False):
+        self.ttl = settings.REMOTE_CACHE_TTL if use_disk_cache else 0
+        self._infos: dict[str, RemoteInfo] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def get(self, repository: str) -> RemoteInfo:
+        with self._locks_guard:
+            lock = self._locks.setdefault(repository, threading.Lock())
+        with lock:
+            if repository not in self._infos:
+                info = self._get_from_disk(repository)
+                if info is None:
+                    info = ls_remote(repository)
+                    if info.available:
+                        self._save_to_disk(info)
+                self._infos[repository] = info
+            return self._infos[repository]
+
+    def prefetch(
+        self,
+        repositories: t.Iterable[str],
+        *,
+        jobs: int | None = None,
+    ):
+        """
+        Requests information about repositories concurrently using at most
+        ``jobs`` threads.
+        """
+        unique_repositories = list(dict.fromkeys(repositories))
+        if not unique_repositories:
+            return
+        # misconfigured backend is reported once rather than by each thread
+        get_backend()
+        with ThreadPoolExecutor(jobs) as executor:
+            list(executor.map(self.get, unique_repositories))
+
+    def update_head(self, repository: str, branch: str, sha: str):
+        """
+        Remembers new head of the branch after it has been pushed.
+        """
+        info = self.get(repository)
+        info.heads[branch] = sha
+        if info.available:
+            self._save_to_disk(info)
+
+    def invalidate(self, repository: str):
+        """
+        Forgets everything known about the repository, e.g. when operation
+        with it failed and information might be outdated.
+        """
+        self._infos.pop(repository, None)
+        if self.ttl <= 0:
+            return
+        with self._disk_lock:
+            stored = load_stored_infos()
+            if stored.pop(repository, None) is not None:
+                save_stored_infos(stored)
+
+    def _get_from_disk(self, repository: str) -> RemoteInfo | None:
+        if self.ttl <= 0:
+            return None
+        with self._disk_lock:
+            stored = load_stored_infos().get(repository)
+        try:
+            if stored is None or time.time() - stored['checked_at'] > self.ttl:
+                return None
+            return RemoteInfo(
+                repository,
+                dict(stored['heads']),
+                checked_at=stored['checked_at'],
+                cached=True,
+            )
+        except (KeyError, TypeError, ValueError):
+            # cache file was modified by hand
+            return None
+
+    def _save_to_disk(self, info: RemoteInfo):
+        if self.ttl <= 0:
+            return
+        with self._disk_lock:
+            stored = load_stored_infos()
+            stored[info.repository] = {
+                'checked_at': info.checked_at,
+                'heads': info.heads,
+            }
+            save_stored_infos(stored)
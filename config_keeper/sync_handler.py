@@ -1,13 +1,43 @@
+import collections
 import datetime
+import enum
+import hashlib
+import io
+import os
 import shutil
+import stat
 import subprocess
 import tempfile
-from pathlib import Path
+import threading
+import time
+import typing as t
+from pathlib import Path, PurePosixPath
 
 from rich.markup import escape
 
-from config_keeper import config
-from config_keeper import exceptions as exc
+from config_keeper import config, settings, tracing
+from config_keeper.backends import (
+    count_processes,
+    get_backend,
+    get_executable,
+    record_process,
+    run_cmd,
+)
+from config_keeper.files import (
+    CopyStats,
+    TCompare,
+    TCopy,
+    copy_file,
+    copy_path,
+    files_differ,
+    format_strategies,
+    link_file,
+    remove_path,
+    sync_path,
+)
+from config_keeper.manifest import Manifest, load_manifest
+from config_keeper.remotes import RemoteInfoCache
+from config_keeper.timings import Timings
 
 
 def delete_dir(directory: str | Path):
@@ -18,14 +48,6 @@ def delete_dir(directory: str | Path):
     shutil.rmtree(str(directory), ignore_errors=True)
 
 
-def run_cmd(cmd: list[str]) -> subprocess.CompletedProcess[str]:
-    executable = shutil.which(cmd[0])
-    if not executable:
-        raise exc.ExecutableNotFoundError(cmd[0])
-    cmd = [executable] + cmd[1:]
-    return subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-
 def clear_working_tree(path: Path | str):
     """
     Removes all files and directories in specified path except .git directory.
@@ -39,17 +61,257 @@ def clear_working_tree(path: Path | str):
             entity.unlink()
 
 
-def remote_branch_exists(
-    repo: Path | str,
-    branch: str,
-    remote_name: str = 'origin',
-) -> bool:
+def get_mirror_dir(repository: str) -> Path:
+    """
+    Returns path of a local mirror of the repository. Mirrors are bare
+    repositories kept in data directory and keyed by repository URL.
+    """
+    key = hashlib.sha1(repository.encode()).hexdigest()
+    return settings.DATA_DIR / 'mirrors' / key
+
+
+_mirror_locks: dict[Path, threading.Lock] = {}
+_mirror_locks_guard = threading.Lock()
+
+
+def get_mirror_lock(mirror: Path) -> threading.Lock:
+    """
+    Returns lock which must be held while the mirror is being updated, so
+    projects sharing the same repository can be synced concurrently.
+    """
+    with _mirror_locks_guard:
+        return _mirror_locks.setdefault(mirror, threading.Lock())
+
+
+def get_mirror_head(mirror: Path, branch: str) -> str | None:
+    """
+    Returns commit sha of the branch in the mirror or ``None`` if the mirror
+    does not have such branch.
+    """
     full_name = f'refs/heads/{branch}'
     result = run_cmd([
-        'git', '-C', str(repo), 'ls-remote', '--heads', remote_name,
-        full_name,
+        'git', '-C', str(mirror), 'for-each-ref',
+        '--format=%(objectname) %(refname)', full_name,
     ])
-    return full_name in result.stdout
+    for line in result.stdout.splitlines():
+        sha, _, refname = line.partition(' ')
+        if refname == full_name:
+            return sha
+    return None
+
+
+def get_tree_objects(repo: Path, ref: str) -> dict[str, str]:
+    """
+    Returns ids of objects at the top level of the commit tree keyed by their
+    names.
+    """
+    result = run_cmd(['git', '-C', str(repo), 'ls-tree', '-z', ref])
+    objects: dict[str, str] = {}
+    for entry in filter(None, result.stdout.split('\0')):
+        info, _, name = entry.partition('\t')
+        objects[name] = info.split()[2]
+    return objects
+
+
+PathState = t.Literal[
+    'in sync',
+    'local-modified',
+    'remote-modified',
+    'diverged',
+    'missing',
+]
+
+STATE_MARKUP: dict[PathState, str] = {
+    'in sync': '[green]in sync[/green]',
+    'local-modified': '[yellow]local-modified[/yellow]',
+    'remote-modified': '[cyan]remote-modified[/cyan]',
+    'diverged': '[red]diverged[/red]',
+    'missing': '[red]missing[/red]',
+}
+
+
+def get_path_state(
+    local_id: str | None,
+    remote_id: str | None,
+    synced: dict[str, str] | None,
+    path_name: str,
+) -> PathState:
+    """
+    Tells how the path differs from the remote branch using ids of their git
+    objects and ids remembered when the project was synced last time.
+    ``None`` id means that the path does not exist (or has no files).
+    """
+    if local_id is None and remote_id is not None:
+        return 'missing'
+    if local_id == remote_id:
+        return 'in sync'
+    if synced is None:
+        # the project has never been synced, so only new paths are known to
+        # be modified locally
+        return 'local-modified' if remote_id is None else 'diverged'
+    synced_id = synced.get(path_name)
+    if synced_id == local_id:
+        return 'remote-modified'
+    if synced_id == remote_id:
+        return 'local-modified'
+    return 'diverged'
+
+
+REGULAR_MODE = '100644'
+EXECUTABLE_MODE = '100755'
+SYMLINK_MODE = '120000'
+
+
+def get_file_mode(st_mode: int) -> str:
+    """
+    Returns git mode of the regular file the same way as ``git add`` does.
+    """
+    return EXECUTABLE_MODE if st_mode & stat.S_IXUSR else REGULAR_MODE
+
+
+def copy_exactly(source: t.IO[bytes], dest: t.IO[bytes], size: int) -> int:
+    """
+    Copies ``size`` bytes chunk by chunk, so huge files are not held in
+    memory. Returns number of copied bytes, which is less than ``size`` if
+    ``source`` ends earlier.
+    """
+    copied = 0
+    while copied < size:
+        chunk = source.read(min(size - copied, 1024 * 1024))
+        if not chunk:
+            break
+        dest.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def quote_fast_import_path(path: str) -> str:
+    """
+    Quotes path for ``git fast-import`` if it cannot be written as is.
+    """
+    if '\n' not in path and not path.startswith('"'):
+        return path
+    escaped = path.replace('\\', '\\\\').replace('"', '\\"')
+    return '"' + escaped.replace('\n', '\\n') + '"'
+
+
+def get_permissions(st_mode: int | None, git_mode: str) -> int:
+    """
+    Returns permissions for a file written with git ``git_mode``, keeping
+    other permissions of the existing file (if ``st_mode`` is given).
+    """
+    permissions = 0o644 if st_mode is None else st_mode & 0o7777
+    if git_mode == EXECUTABLE_MODE:
+        return permissions | (permissions & 0o444) >> 2
+    return permissions & ~0o111
+
+
+# mode and blob id of a file in git tree
+TTreeEntry = tuple[str, str]
+
+
+def list_tree(
+    repo: Path,
+    ref: str,
+    path_names: list[str],
+) -> dict[str, dict[str, TTreeEntry]]:
+    """
+    Lists files of the commit tree under ``path_names`` recursively. Returns
+    their modes and blob ids keyed by path name and then by path relative to
+    it (empty if path name itself is a file).
+    """
+    if not path_names:
+        return {}
+    result = run_cmd([
+        'git', '-C', str(repo), 'ls-tree', '-r', '-z', ref, '--', *path_names,
+    ])
+    tree: dict[str, dict[str, TTreeEntry]] = {}
+    for entry in filter(None, result.stdout.split('\0')):
+        info, _, path = entry.partition('\t')
+        mode, object_type, object_id = info.split()
+        if object_type != 'blob':
+            # submodules cannot be pulled
+            continue
+        path_name, _, relative_path = path.partition('/')
+        tree.setdefault(path_name, {})[relative_path] = (mode, object_id)
+    return tree
+
+
+class BlobReader:
+    """
+    Reads blobs from the repository using single long-lived
+    ``git cat-file --batch`` process.
+    """
+
+    def __init__(self, repo: Path):
+        self.cmd = [
+            get_executable('git'), '-C', str(repo), 'cat-file', '--batch',
+        ]
+        self._started = time.perf_counter()
+        self._process = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> 'BlobReader':
+        return self
+
+    def __exit__(self, *args: object):
+        _, stderr = self._process.communicate()
+        record_process(self._started, self.cmd)
+        if self._process.returncode:  # nocv
+            raise subprocess.CalledProcessError(
+                self._process.returncode,
+                self.cmd,
+                '',
+                stderr.decode(errors='replace'),
+            )
+
+    def copy_to(self, blob: str, file: t.BinaryIO):
+        """
+        Writes content of the blob into the file chunk by chunk.
+        """
+        assert self._process.stdin is not None
+        assert self._process.stdout is not None
+        self._process.stdin.write(f'{blob}\n'.encode())
+        self._process.stdin.flush()
+
+        header = self._process.stdout.readline().decode().split()
+        if len(header) != 3 or header[1] != 'blob':  # noqa: PLR2004
+            raise subprocess.CalledProcessError(
+                1,
+                self.cmd,
+                '',
+                f'cannot read blob {blob}: {" ".join(header)}',
+            )
+        remaining = int(header[2])
+        while remaining:
+            chunk = self._process.stdout.read(min(remaining, 1024 * 1024))
+            if not chunk:  # nocv
+                msg = f'unexpected end of blob {blob}'
+                raise subprocess.CalledProcessError(1, self.cmd, '', msg)
+            file.write(chunk)
+            remaining -= len(chunk)
+        # blob content is followed by line feed
+        self._process.stdout.read(1)
+
+    def read(self, blob: str) -> bytes:
+        buffer = io.BytesIO()
+        self.copy_to(blob, buffer)
+        return buffer.getvalue()
+
+
+class PullEngine(str, enum.Enum):
+    WORKTREE = 'worktree'
+    CAT_FILE = 'cat-file'
+
+
+class PushEngine(str, enum.Enum):
+    WORKTREE = 'worktree'
+    INDEX = 'index'
+    FAST_IMPORT = 'fast-import'
 
 
 class SyncHandler:
@@ -59,94 +321,482 @@ class SyncHandler:
         conf: config.TConfig,
         *,
         verbose_output: bool = False,
+        remotes: RemoteInfoCache | None = None,
+        shallow: bool = False,
+        partial: bool = False,
+        incremental: bool = True,
+        link: bool = False,
+        engine: PushEngine = PushEngine.WORKTREE,
+        pull_engine: PullEngine = PullEngine.WORKTREE,
+        offline: bool = False,
     ):
         self.project = project
         self.conf = conf
         self.verbose_output = verbose_output
+        self.remotes = remotes or RemoteInfoCache()
+        self.shallow = shallow
+        self.partial = partial
+        self.incremental = incremental
+        self.link = link
+        self.engine = engine
+        self.pull_engine = pull_engine
+        self.offline = offline
+        self.backend = get_backend()
+        self.timings = Timings()
         self._output: str = ''
+        self._copy_strategies: collections.Counter[str] = collections.Counter()
+
+    def status(self):
+        """
+        Writes state of each path of the project compared with the remote
+        branch without checking out any files. If the repository is
+        unavailable or handler is ``offline``, the branch is taken from the
+        mirror as it was fetched last time.
+        """
+        self._operate(self._status)
 
     def push(self):
+        self._operate(self._push)
+        self._write_copy_summary()
+
+    def pull(self):
+        self._operate(self._pull)
+        self._write_copy_summary()
+
+    def get_output(self, verbose: bool = False) -> str:
+        return self._output.strip()
+
+    def _operate(self, operation: t.Callable[[], None]):
+        name = f'{operation.__name__.lstrip("_")} {self.project}'
+        with tracing.span(name, 'project'), count_processes() as processes:
+            try:
+                operation()
+            except subprocess.CalledProcessError:
+                self._invalidate_remote()
+                raise
+            finally:
+                self._write_output(f'Spawned {processes}', verbose=True)
+
+    def _push(self):
         branch = self.conf['projects'][self.project]['branch']
         repository = self.conf['projects'][self.project]['repository']
 
-        temp_dir = tempfile.mkdtemp()
+        with self.timings.phase('remote'):
+            remote = self.remotes.get(repository)
+        is_new_branch = remote.available and remote.get_head(branch) is None
+        manifest = load_manifest(self.project)
 
-        self._run_cmd(['git', 'init', temp_dir])
-        self._run_cmd([
-            'git', '-C', temp_dir, 'remote', 'add', 'origin', repository,
-        ])
+        temp_dir = self._clone_mirror(
+            repository,
+            None if is_new_branch else branch,
+            depth=1 if self.shallow else None,
+        )
 
-        if remote_branch_exists(temp_dir, branch):
-            self._run_cmd(['git', '-C', temp_dir, 'fetch', 'origin'])
-            self._run_cmd(['git', '-C', temp_dir, 'checkout', branch])
-            clear_working_tree(temp_dir)
-        else:
-            self._run_cmd(['git', '-C', temp_dir, 'checkout', '-b', branch])
+        commit_msg = self._get_commit_message()
+        with self.timings.phase('commit'):
+            if self.engine is PushEngine.INDEX:
+                commit = self._commit_from_index(
+                    temp_dir,
+                    branch,
+                    commit_msg,
+                    is_new_branch=is_new_branch,
+                )
+            elif self.engine is PushEngine.FAST_IMPORT:
+                commit = self._commit_with_fast_import(
+                    temp_dir,
+                    branch,
+                    commit_msg,
+                    is_new_branch=is_new_branch,
+                )
+            else:
+                commit = self._commit_from_worktree(
+                    temp_dir,
+                    branch,
+                    commit_msg,
+                    manifest,
+                    is_new_branch=is_new_branch,
+                )
 
-        self._fetch_files(temp_dir)
+        if commit is None:
+            self._save_synced(manifest, temp_dir, f'origin/{branch}')
+            self._delete_dir(temp_dir)
+            self._write_output('Already up to date')
+            return
 
-        self._run_cmd(['git', '-C', temp_dir, 'add', '.'])
+        with self.timings.phase('push'):
+            self._write_output(self.backend.push(
+                Path(temp_dir),
+                repository,
+                commit,
+                branch,
+                set_upstream=self.engine is PushEngine.WORKTREE,
+            ), verbose=True)
+            self._update_mirror_head(temp_dir, repository, commit, branch)
+        self.remotes.update_head(repository, branch, commit)
+        self._save_synced(manifest, temp_dir, commit)
 
-        commit_msg = self._get_commit_message()
-        self._run_cmd([
-            'git', '-C', temp_dir, 'commit', '-m', commit_msg,
+        self._delete_dir(temp_dir)
+        self._write_output(f'Committed as "{escape(commit_msg)}"')
+
+    def _commit_from_worktree(
+        self,
+        temp_dir: str,
+        branch: str,
+        commit_msg: str,
+        manifest: Manifest,
+        *,
+        is_new_branch: bool,
+    ) -> str | None:
+        """
+        Copies local files into working tree of the temporary repository and
+        commits them. Returns sha of the commit or ``None`` if nothing has
+        changed.
+        """
+        with self.timings.phase('checkout'):
+            if is_new_branch:
+                self._run_cmd([
+                    'git', '-C', temp_dir, 'switch', '--orphan', branch,
+                ])
+            else:
+                self._run_cmd(['git', '-C', temp_dir, 'checkout', branch])
+                if not self.incremental:
+                    clear_working_tree(temp_dir)
+
+        with self.timings.phase('copy'):
+            if self.incremental:
+                self._update_files(temp_dir, manifest)
+            else:
+                self._fetch_files(temp_dir)
+
+        self._write_output(self.backend.stage(Path(temp_dir)), verbose=True)
+
+        if not is_new_branch and self._is_index_unchanged(temp_dir):
+            return None
+
+        commit, output = self.backend.commit(Path(temp_dir), commit_msg)
+        self._write_output(output, verbose=True)
+        return commit
+
+    def _commit_from_index(
+        self,
+        temp_dir: str,
+        branch: str,
+        commit_msg: str,
+        *,
+        is_new_branch: bool,
+    ) -> str | None:
+        """
+        Hashes local files straight into object database of the temporary
+        repository and builds the commit using index plumbing, so files are
+        neither copied nor checked out. Returns sha of the commit or ``None``
+        if nothing has changed.
+        """
+        sources = list(self._iter_sources())
+        self.timings.count(
+            len(sources),
+            sum(file_stat.st_size for _, _, file_stat in sources),
+        )
+        blobs = self._hash_objects(temp_dir, [path for _, path, _ in sources])
+        index_info = ''.join(
+            f'{get_file_mode(file_stat.st_mode)} {blob}\t{name}\0'
+            for (name, _, file_stat), blob in zip(sources, blobs, strict=True)
+        )
+        run_cmd(
+            ['git', '-C', temp_dir, 'update-index', '-z', '--index-info'],
+            index_info,
+        )
+        self._write_output(f'Staged {len(sources)} files')
+
+        tree = run_cmd(['git', '-C', temp_dir, 'write-tree']).stdout.strip()
+        parent_args: list[str] = []
+        if not is_new_branch:
+            parent = f'origin/{branch}'
+            parent_tree = run_cmd([
+                'git', '-C', temp_dir, 'rev-parse', f'{parent}^{{tree}}',
+            ])
+            if parent_tree.stdout.strip() == tree:
+                return None
+            parent_args = ['-p', parent]
+
+        result = self._run_cmd([
+            'git', '-C', temp_dir, 'commit-tree', tree, *parent_args,
+            '-m', commit_msg,
         ])
-        self._run_cmd([
-            'git', '-C', temp_dir, 'push', '--set-upstream', 'origin', branch,
+        return result.stdout.strip()
+
+    def _hash_objects(self, temp_dir: str, paths: list[Path]) -> list[str]:
+        """
+        Writes files into object database and returns their blob ids. Files
+        are hashed by a single process, except ones which paths contain line
+        breaks and thus cannot be passed to it.
+        """
+        cmd = ['git', '-C', temp_dir, 'hash-object', '-w', '--no-filters']
+        plain_paths = [path for path in paths if '\n' not in str(path)]
+        blobs: dict[Path, str] = {}
+        if plain_paths:
+            result = run_cmd(
+                [*cmd, '--stdin-paths'],
+                ''.join(f'{path}\n' for path in plain_paths),
+            )
+            blobs = dict(zip(plain_paths, result.stdout.split(), strict=True))
+        for path in paths:
+            if path not in blobs:
+                blobs[path] = run_cmd([*cmd, '--', str(path)]).stdout.strip()
+        return [blobs[path] for path in paths]
+
+    def _commit_with_fast_import(
+        self,
+        temp_dir: str,
+        branch: str,
+        commit_msg: str,
+        *,
+        is_new_branch: bool,
+    ) -> str | None:
+        """
+        Streams local files and a single commit into one ``git fast-import``
+        process, so the whole commit is built in one pass without any working
+        tree. Returns sha of the commit or ``None`` if nothing has changed.
+        """
+        committer = run_cmd([
+            'git', '-C', temp_dir, 'var', 'GIT_COMMITTER_IDENT',
         ])
+        message = commit_msg.encode()
+        ref = 'refs/config-keeper/push'
+        header = (
+            f'commit {ref}\n'
+            f'committer {committer.stdout.strip()}\n'
+            f'data {len(message)}\n'
+        ).encode() + message + b'\n'
+        if not is_new_branch:
+            header += f'from refs/remotes/origin/{branch}^0\n'.encode()
+        header += b'deleteall\n'
 
-        self._delete_dir(temp_dir)
-        self._write_output(f'Committed as "{escape(commit_msg)}"')
+        cmd = [get_executable('git'), '-C', temp_dir, 'fast-import', '--quiet']
+        started = time.perf_counter()
+        with subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ) as process:
+            assert process.stdin is not None
+            count = 0
+            truncated: Path | None = None
+            try:
+                process.stdin.write(header)
+                for name, path, file_stat in self._iter_sources():
+                    with path.open('rb') as f:
+                        # the file may be written in the meantime, so exactly
+                        # the size of the opened file is announced and copied
+                        size = os.fstat(f.fileno()).st_size
+                        process.stdin.write((
+                            f'M {get_file_mode(file_stat.st_mode)} inline '
+                            f'{quote_fast_import_path(name)}\n'
+                            f'data {size}\n'
+                        ).encode())
+                        copied = copy_exactly(f, process.stdin, size)
+                    if copied < size:
+                        # fast-import would take what follows for the rest of
+                        # the file, so it is stopped before committing
+                        truncated = path
+                        process.kill()
+                        break
+                    process.stdin.write(b'\n')
+                    self.timings.count(1, size)
+                    count += 1
+            except BrokenPipeError:  # nocv
+                # fast-import failed, its error is reported below
+                pass
+            stdout, stderr = process.communicate()
+        record_process(started, cmd)
+        if truncated is not None:
+            msg = f'error: {truncated} was truncated while it was read'
+            raise subprocess.CalledProcessError(1, cmd, '', msg)
+        if process.returncode:
+            raise subprocess.CalledProcessError(
+                process.returncode,
+                cmd,
+                stdout.decode(errors='replace'),
+                stderr.decode(errors='replace'),
+            )
+        self._write_output(f'Imported {count} files')
 
-    def pull(self):
-        pull_dir = tempfile.mkdtemp()
+        revisions = [ref, f'{ref}^{{tree}}']
+        if not is_new_branch:
+            revisions.append(f'origin/{branch}^{{tree}}')
+        result = run_cmd(['git', '-C', temp_dir, 'rev-parse', *revisions])
+        commit, tree, *parent_tree = result.stdout.split()
+        if parent_tree == [tree]:
+            return None
+        return commit
+
+    def _iter_sources(self) -> t.Iterator[tuple[str, Path, os.stat_result]]:
+        """
+        Yields local files of the project as path in repository, path on disk
+        and its stat. Symlinks are followed like when files are copied.
+        """
+        for path_name, str_path in self._trace_paths():
+            path = Path(str_path).expanduser().resolve()
+            if path.is_dir():
+                yield from self._scan_dir(path, path_name)
+            else:
+                yield path_name, path, path.stat()
+
+    def _scan_dir(
+        self,
+        directory: Path,
+        name: str,
+    ) -> t.Iterator[tuple[str, Path, os.stat_result]]:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                entry_name = f'{name}/{entry.name}'
+                if entry.is_dir():
+                    yield from self._scan_dir(Path(entry.path), entry_name)
+                else:
+                    yield entry_name, Path(entry.path), entry.stat()
+
+    def _pull(self):
         branch = self.conf['projects'][self.project]['branch']
         repository = self.conf['projects'][self.project]['repository']
 
-        self._run_cmd(['git', 'init', pull_dir])
-        self._run_cmd([
-            'git', '-C', pull_dir, 'pull', repository, branch,
-        ])
+        if self.pull_engine is PullEngine.CAT_FILE:
+            mirror = get_mirror_dir(repository)
+            with get_mirror_lock(mirror):
+                self._update_mirror(
+                    repository,
+                    mirror,
+                    branch,
+                    depth=1 if self.shallow else None,
+                )
+            manifest = load_manifest(self.project)
+            with self.timings.phase('copy'):
+                self._stream_in_places(mirror, branch, manifest)
+            self._save_synced(manifest, str(mirror), branch)
+            return
 
-        self._put_in_places(pull_dir)
+        if self.partial:
+            pull_dir = self._fetch_partially(repository, branch)
+            pulled_ref = 'FETCH_HEAD'
+        else:
+            pull_dir = self._clone_mirror(
+                repository,
+                branch,
+                depth=1 if self.shallow else None,
+            )
+            with self.timings.phase('checkout'):
+                self._run_cmd(['git', '-C', pull_dir, 'checkout', branch])
+            pulled_ref = 'HEAD'
+
+        manifest = load_manifest(self.project)
+        with self.timings.phase('copy'):
+            self._put_in_places(pull_dir, manifest)
+        self._save_synced(manifest, pull_dir, pulled_ref)
         self._delete_dir(pull_dir)
 
-    def get_output(self, verbose: bool = False) -> str:
-        return self._output.strip()
+    def _status(self):
+        branch = self.conf['projects'][self.project]['branch']
+        repository = self.conf['projects'][self.project]['repository']
+        paths = self.conf['projects'][self.project]['paths']
+
+        with self.timings.phase('remote'):
+            remote = None if self.offline else self.remotes.get(repository)
+        mirror = get_mirror_dir(repository)
+        with self.timings.phase('fetch'), get_mirror_lock(mirror):
+            self._ensure_mirror(repository, mirror)
+            head = get_mirror_head(mirror, branch)
+            if remote is not None and remote.available:
+                remote_head = remote.get_head(branch)
+                if remote_head is not None and head != remote_head:
+                    self._write_output(
+                        self.backend.fetch(mirror, branch),
+                        verbose=True,
+                    )
+                head = remote_head
+            elif remote is not None:
+                self._write_output(
+                    'Repository is unavailable, compared with its last '
+                    'fetched state',
+                )
+        remote_objects = (
+            {} if head is None
+            else get_tree_objects(mirror, f'refs/heads/{branch}')
+        )
+
+        manifest = load_manifest(self.project)
+        with self.timings.phase('compare'):
+            for path_name, str_path in sorted(paths.items()):
+                path = Path(str_path).expanduser().resolve()
+                state = get_path_state(
+                    manifest.get_object_id(path) if path.exists() else None,
+                    remote_objects.get(path_name),
+                    manifest.synced,
+                    path_name,
+                )
+                self._write_output(f'{STATE_MARKUP[state]} {str_path}')
+            manifest.save()
 
     def _fetch_files(self, directory: Path | str):
         directory = Path(directory)
 
-        paths = self.conf['projects'][self.project]['paths']
-        for path_name, str_path in paths.items():
+        for path_name, str_path in self._trace_paths():
             path = Path(str_path).expanduser().resolve()
-            dest = str(directory / path_name)
-            copy_args = (str_path, dest)
-            if path.is_file():
-                shutil.copy2(*copy_args)
-            else:
-                shutil.copytree(*copy_args)
+            self._count_copies(copy_path(
+                path,
+                directory / path_name,
+                copy=self._get_staging_copy(),
+            ))
             self._write_output(f'Fetched {path}')
 
-    def _put_in_places(self, directory: Path | str):
+    def _update_files(self, directory: Path | str, manifest: Manifest):
+        """
+        Same as ``_fetch_files`` but expects checked out working tree in
+        ``directory`` and writes only files which differ from it.
+        """
         directory = Path(directory)
+
         paths = self.conf['projects'][self.project]['paths']
+        compare = self._get_comparer(directory, manifest)
+        for entity in directory.iterdir():
+            if entity.name != '.git' and entity.name not in paths:
+                remove_path(entity)
+        for path_name, str_path in self._trace_paths():
+            path = Path(str_path).expanduser().resolve()
+            stats = sync_path(
+                path,
+                directory / path_name,
+                compare=compare,
+                copy=self._get_staging_copy(),
+            )
+            self._count_copies(stats)
+            self._write_output(f'Fetched {path}')
+            self._write_output(f'({stats})', verbose=True)
 
-        for path_name, str_path in paths.items():
+    def _get_staging_copy(self) -> TCopy:
+        """
+        Returns function which writes local files into temporary repository
+        before push.
+        """
+        return link_file if self.link else copy_file
+
+    def _put_in_places(self, directory: Path | str, manifest: Manifest):
+        directory = Path(directory)
+        compare = self._get_comparer(directory, manifest)
+
+        for path_name, str_path in self._trace_paths():
             source = directory / path_name
             dest = Path(str_path).expanduser().resolve()
-            copy_args = (str(source), str_path)
-            if source.exists():
+            if source.exists() and self.incremental:
+                stats = sync_path(source, dest, compare=compare)
+                self._count_copies(stats)
+                self._write_output(f'Put {dest}')
+                self._write_output(f'({stats})', verbose=True)
+            elif source.exists():
                 if dest.is_file():
                     dest.unlink()
                 elif dest.is_dir():
                     shutil.rmtree(str(dest))
 
-                if source.is_file():
-                    dest.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(*copy_args)
-                else:
-                    shutil.copytree(*copy_args)
+                self._count_copies(copy_path(source, dest))
                 self._write_output(f'Put {dest}')
             else:
                 self._write_output(
@@ -154,17 +804,387 @@ class SyncHandler:
                     f'[magenta].[/magenta]/{path_name}',
                 )
 
+    def _get_comparer(self, directory: Path, manifest: Manifest) -> TCompare:
+        """
+        Returns function which compares a local file with a file of the
+        working tree in ``directory`` (in any order) by their blob ids. Blob
+        id of the local file is taken from the manifest and blob id of the
+        other one from the index, so usually none of them is read.
+        """
+        result = run_cmd(['git', '-C', str(directory), 'ls-files', '-s', '-z'])
+        index_blobs: dict[str, str] = {}
+        for entry in filter(None, result.stdout.split('\0')):
+            info, _, path = entry.partition('\t')
+            index_blobs[path] = info.split()[1]
+
+        def compare(first: Path, second: Path) -> bool:
+            tree_file, local_file = first, second
+            if not tree_file.is_relative_to(directory):
+                tree_file, local_file = second, first
+            key = tree_file.relative_to(directory).as_posix()
+            if (
+                key not in index_blobs
+                or tree_file.stat().st_size != local_file.stat().st_size
+            ):
+                return files_differ(first, second)
+            return manifest.get_blob_id(local_file) != index_blobs[key]
+
+        return compare
+
+    def _stream_in_places(self, repo: Path, ref: str, manifest: Manifest):
+        """
+        Same as ``_put_in_places`` but reads files of ``ref`` straight from
+        object database of ``repo`` without checking them out.
+        """
+        paths = self.conf['projects'][self.project]['paths']
+        tree = list_tree(repo, ref, list(paths))
+
+        with BlobReader(repo) as reader:
+            for path_name, str_path in self._trace_paths():
+                if path_name not in tree:
+                    self._write_output(
+                        f'Skipped {str_path} because repository does not '
+                        f'contain [magenta].[/magenta]/{path_name}',
+                    )
+                    continue
+
+                dest = Path(str_path).expanduser().resolve()
+                stats = CopyStats()
+                if not self.incremental and (
+                    dest.exists() or dest.is_symlink()
+                ):
+                    remove_path(dest)
+                files = tree[path_name]
+                if '' in files:
+                    self._stream_file(reader, files[''], dest, manifest, stats)
+                else:
+                    self._stream_dir(reader, files, dest, manifest, stats)
+                self._count_copies(stats)
+                self._write_output(f'Put {dest}')
+                self._write_output(f'({stats})', verbose=True)
+
+    def _stream_dir(
+        self,
+        reader: BlobReader,
+        files: dict[str, TTreeEntry],
+        dest: Path,
+        manifest: Manifest,
+        stats: CopyStats,
+    ):
+        if dest.is_symlink() or dest.is_file():
+            dest.unlink()
+            stats.deleted += 1
+
+        dirs = {
+            parent.as_posix()
+            for name in files
+            for parent in PurePosixPath(name).parents
+        }
+        for root, dirnames, filenames in os.walk(dest):
+            relative_root = Path(root).relative_to(dest)
+            for dirname in list(dirnames):
+                path = Path(root, dirname)
+                if (
+                    (relative_root / dirname).as_posix() not in dirs
+                    or path.is_symlink()
+                ):
+                    remove_path(path)
+                    dirnames.remove(dirname)
+                    stats.deleted += 1
+            for filename in filenames:
+                if (relative_root / filename).as_posix() not in files:
+                    remove_path(Path(root, filename))
+                    stats.deleted += 1
+
+        for name, entry in files.items():
+            self._stream_file(reader, entry, dest / name, manifest, stats)
+
+    def _stream_file(
+        self,
+        reader: BlobReader,
+        entry: TTreeEntry,
+        dest: Path,
+        manifest: Manifest,
+        stats: CopyStats,
+    ):
+        mode, blob = entry
+        if mode == SYMLINK_MODE:
+            self._stream_symlink(reader, blob, dest, stats)
+            return
+
+        exists = dest.is_file() and not dest.is_symlink()
+        if exists and manifest.get_blob_id(dest) == blob:
+            st_mode = dest.stat().st_mode
+            if get_file_mode(st_mode) == mode:
+                stats.unchanged += 1
+            else:
+                dest.chmod(get_permissions(st_mode, mode))
+                stats.changed += 1
+            return
+
+        if dest.is_dir() and not dest.is_symlink():
+            shutil.rmtree(dest)
+            stats.deleted += 1
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        # write to sibling file first, so destination is replaced atomically
+        fd, staging_file = tempfile.mkstemp(
+            dir=dest.parent,
+            prefix=f'.{dest.name}.',
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                reader.copy_to(blob, f)
+            Path(staging_file).chmod(get_permissions(
+                dest.stat().st_mode if exists else None,
+                mode,
+            ))
+            Path(staging_file).replace(dest)
+        except BaseException:
+            Path(staging_file).unlink(missing_ok=True)
+            raise
+        stats.strategies['cat-file'] += 1
+        stats.bytes += dest.stat().st_size
+        if exists:
+            stats.changed += 1
+        else:
+            stats.added += 1
+
+    def _stream_symlink(
+        self,
+        reader: BlobReader,
+        blob: str,
+        dest: Path,
+        stats: CopyStats,
+    ):
+        target = os.fsdecode(reader.read(blob))
+        if dest.is_symlink() and str(dest.readlink()) == target:
+            stats.unchanged += 1
+            return
+        if dest.exists() or dest.is_symlink():
+            remove_path(dest)
+            stats.deleted += 1
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.symlink_to(target)
+        stats.added += 1
+
+    def _ensure_mirror(self, repository: str, mirror: Path):
+        """
+        Creates a local mirror of the repository if it does not exist yet.
+        """
+        if mirror.is_dir():
+            return
+
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        temp_mirror = tempfile.mkdtemp(dir=mirror.parent)
+        self._write_output(
+            self.backend.init(Path(temp_mirror), repository, mirror=True),
+            verbose=True,
+        )
+        try:
+            Path(temp_mirror).rename(mirror)
+        except OSError:  # nocv
+            # mirror has been created by someone else in the meantime
+            self._delete_dir(temp_mirror)
+        self._write_output(f'Created mirror {mirror}', verbose=True)
+
+    def _clone_mirror(
+        self,
+        repository: str,
+        ref: str | None,
+        *,
+        depth: int | None = None,
+    ) -> str:
+        """
+        Updates the mirror of the repository and makes a temporary clone of it
+        without copying objects or checking out files.
+        """
+        mirror = get_mirror_dir(repository)
+        # hard links can be made only inside the same filesystem, which is
+        # more likely for data directory than for system temporary directory
+        if self.link:
+            mirror.parent.mkdir(parents=True, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=mirror.parent if self.link else None)
+        with get_mirror_lock(mirror):
+            self._update_mirror(repository, mirror, ref, depth=depth)
+            with self.timings.phase('checkout'):
+                self._run_cmd([
+                    'git', 'clone', '--shared', '--no-checkout', str(mirror),
+                    temp_dir,
+                ])
+        return temp_dir
+
+    def _update_mirror_head(
+        self,
+        temp_dir: str,
+        repository: str,
+        commit: str,
+        branch: str,
+    ):
+        """
+        Moves the branch of the mirror to the commit which has just been
+        pushed from the temporary repository, so the next run does not fetch
+        it back.
+        """
+        mirror = get_mirror_dir(repository)
+        with get_mirror_lock(mirror):
+            try:
+                output = self.backend.push(
+                    Path(temp_dir),
+                    str(mirror),
+                    commit,
+                    branch,
+                    force=True,
+                )
+            except subprocess.CalledProcessError as e:
+                # mirror is only a cache, the next run fetches the branch then
+                output = (e.stdout + e.stderr).strip()
+            self._write_output(output, verbose=True)
+
+    def _update_mirror(
+        self,
+        repository: str,
+        mirror: Path,
+        ref: str | None,
+        *,
+        depth: int | None = None,
+    ):
+        """
+        Fetches ``ref`` into the mirror of the repository unless the mirror
+        already has it up to date. If ``depth`` is given, history of ``ref``
+        is truncated to that number of commits. Mirror lock must be held.
+        """
+        with self.timings.phase('fetch'):
+            self._ensure_mirror(repository, mirror)
+            if ref is not None and not self._is_mirror_up_to_date(
+                mirror,
+                repository,
+                ref,
+            ):
+                self._write_output(
+                    self.backend.fetch(mirror, ref, depth=depth),
+                    verbose=True,
+                )
+
+    def _fetch_partially(self, repository: str, ref: str) -> str:
+        """
+        Fetches the tip commit of ``ref`` without blobs into a temporary
+        repository and checks out only configured paths, so blobs of other
+        files are never downloaded. The mirror is not used here because
+        shared clones of a repository with missing blobs cannot be checked out.
+        """
+        pull_dir = tempfile.mkdtemp()
+        with self.timings.phase('fetch'):
+            self._write_output(
+                self.backend.init(Path(pull_dir), repository),
+                verbose=True,
+            )
+            self._write_output(
+                self.backend.fetch(Path(pull_dir), ref, depth=1, blobs=False),
+                verbose=True,
+            )
+
+            result = run_cmd([
+                'git', '-C', pull_dir, 'ls-tree', '-z', '--name-only',
+                'FETCH_HEAD',
+            ])
+            paths = self.conf['projects'][self.project]['paths']
+            path_names = sorted(set(result.stdout.split('\0')) & set(paths))
+            if path_names:
+                # blobs of checked out files are fetched here
+                self._run_cmd([
+                    'git', '-C', pull_dir, 'checkout', 'FETCH_HEAD', '--',
+                    *path_names,
+                ])
+        return pull_dir
+
+    def _is_mirror_up_to_date(
+        self,
+        mirror: Path,
+        repository: str,
+        branch: str,
+    ) -> bool:
+        remote = self.remotes.get(repository)
+        if remote.cached:
+            # heads cached by previous runs may be outdated
+            return False
+        remote_head = remote.get_head(branch)
+        return (
+            remote_head is not None
+            and get_mirror_head(mirror, branch) == remote_head
+        )
+
+    def _is_index_unchanged(self, directory: str) -> bool:
+        """
+        Compares tree of the index with tree of the checked out branch tip, so
+        pushing identical files can be skipped without making a commit.
+        """
+        try:
+            run_cmd([
+                'git', '-C', directory, 'diff-index', '--cached', '--quiet',
+                'HEAD',
+            ])
+        except subprocess.CalledProcessError as e:
+            if e.returncode != 1:  # nocv
+                raise
+            return False
+        return True
+
+    def _save_synced(self, manifest: Manifest, directory: str, ref: str):
+        """
+        Remembers ids of objects of project paths in the synced commit, so
+        the status command can tell which side has changed since then.
+        """
+        paths = self.conf['projects'][self.project]['paths']
+        with self.timings.phase('save'):
+            objects = get_tree_objects(Path(directory), ref)
+            manifest.synced = {
+                path_name: object_id
+                for path_name, object_id in objects.items()
+                if path_name in paths
+            }
+            manifest.save()
+
+    def _invalidate_remote(self):
+        repository = self.conf['projects'][self.project]['repository']
+        self.remotes.invalidate(repository)
+
     def _get_commit_message(self) -> str:
         now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
         return f'Auto push from {now} [{self.project}]'
 
+    def _count_copies(self, stats: CopyStats):
+        self._copy_strategies.update(stats.strategies)
+        self.timings.count(stats.added + stats.changed, stats.bytes)
+
+    def _write_copy_summary(self):
+        if self._copy_strategies:
+            self._write_output(
+                f'Copied {format_strategies(self._copy_strategies)}',
+                verbose=True,
+            )
+
     def _run_cmd(self, cmd: list[str]) -> subprocess.CompletedProcess[str]:
         result = run_cmd(cmd)
         self._write_output(result.stdout + result.stderr, verbose=True)
         return result
 
+    def _trace_paths(self) -> t.Iterator[tuple[str, str]]:
+        """
+        Yields paths of the project, each step of the loop is traced as copy
+        of the path.
+        """
+        paths = self.conf['projects'][self.project]['paths']
+        for path_name, str_path in paths.items():
+            with tracing.span(
+                f'copy {path_name}',
+                'copy',
+                project=self.project,
+            ):
+                yield path_name, str_path
+
     def _delete_dir(self, directory: str | Path):
-        delete_dir(directory)
+        with self.timings.phase('cleanup'):
+            delete_dir(directory)
         self._write_output(f'Deleted {directory}', verbose=True)
 
     def _write_output(self, msg: str, *, verbose: bool = False):
@@ -0,0 +1,84 @@
+import contextlib
+import json
+import time
+import typing as t
+from pathlib import Path
+
+from rich.filesize import decimal
+from rich.table import Table
+
+from config_keeper import tracing
+
+
+class TPhaseTiming(t.TypedDict):
+    phase: str
+    seconds: float
+    files: int
+    bytes: int
+
+
+class Timings:
+    """
+    Wall time, number of files and bytes processed by each phase of an
+    operation. Phases may be nested, time of the inner phase is not counted
+    in the outer one, so times of all phases sum up to the total time.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, TPhaseTiming] = {}
+        self._stack: list[TPhaseTiming] = []
+        self._switched_at = 0.0
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> t.Generator[None, None, None]:
+        self._switch()
+        self._stack.append(self.phases.setdefault(name, {
+            'phase': name,
+            'seconds': 0.0,
+            'files': 0,
+            'bytes': 0,
+        }))
+        try:
+            with tracing.span(name, 'phase'):
+                yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+    def count(self, files: int, size: int):
+        """
+        Adds files and their size in bytes to the current phase.
+        """
+        if self._stack:
+            self._stack[-1]['files'] += files
+            self._stack[-1]['bytes'] += size
+
+    def _switch(self):
+        now = time.perf_counter()
+        if self._stack:
+            self._stack[-1]['seconds'] += now - self._switched_at
+        self._switched_at = now
+
+
+def format_timings_table(timings: dict[str, Timings]) -> Table:
+    table = Table('Project', 'Phase', 'Time', 'Files', 'Size')
+    for column in table.columns[2:]:
+        column.justify = 'right'
+    for project, project_timings in timings.items():
+        for i, phase in enumerate(project_timings.phases.values()):
+            table.add_row(
+                project if i == 0 else '',
+                phase['phase'],
+                f'{phase["seconds"]:.3f}s',
+                str(phase['files']) if phase['files'] else '',
+                decimal(phase['bytes']) if phase['bytes'] else '',
+                end_section=i == len(project_timings.phases) - 1,
+            )
+    return table
+
+
+def save_timings(timings: dict[str, Timings], path: Path):
+    path.write_text(json.dumps({
+        project: list(project_timings.phases.values())
+        for project, project_timings in timings.items()
+    }, indent=2))
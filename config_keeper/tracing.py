@@ -0,0 +1,147 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+P = t.ParamSpec('P')
+R = t.TypeVar('R')
+
+
+class TTraceEvent(t.TypedDict):
+    name: str
+    cat: str
+    ph: str
+    ts: float
+    pid: int
+    tid: int
+    dur: t.NotRequired[float]
+    args: dict[str, t.Any]
+
+
+class Tracer:
+    """
+    Records spans of the whole run in Chrome trace event format, so they can
+    be viewed with chrome://tracing, Perfetto or Speedscope.
+    """
+
+    def __init__(self):
+        self.events: list[TTraceEvent] = []
+        self._lock = threading.Lock()
+        self._named_threads: set[int] = set()
+
+    @contextlib.contextmanager
+    def span(
+        self,
+        name: str,
+        category: str,
+        **args: t.Any,
+    ) -> t.Generator[None, None, None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, started, **args)
+
+    def record(self, name: str, category: str, started: float, **args: t.Any):
+        """
+        Records span which was started at ``started`` (``time.perf_counter``
+        value) and has just finished.
+        """
+        self._add({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': started * 1e6,
+            'dur': (time.perf_counter() - started) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+
+    def save(self, path: Path):
+        with self._lock:
+            events = list(self.events)
+        path.write_text(json.dumps({
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+        }))
+
+    def _add(self, event: TTraceEvent):
+        thread = threading.current_thread()
+        with self._lock:
+            if event['tid'] not in self._named_threads:
+                self._named_threads.add(event['tid'])
+                self.events.append({
+                    'name': 'thread_name',
+                    'cat': '__metadata',
+                    'ph': 'M',
+                    'ts': 0,
+                    'pid': event['pid'],
+                    'tid': event['tid'],
+                    'args': {'name': thread.name},
+                })
+            self.events.append(event)
+
+
+_tracer: Tracer | None = None
+
+
+def start_tracing():
+    global _tracer  # noqa: PLW0603
+    _tracer = Tracer()
+
+
+def stop_tracing(path: Path):
+    """
+    Saves recorded spans to ``path`` and stops tracing.
+    """
+    global _tracer  # noqa: PLW0603
+    if _tracer is not None:
+        _tracer.save(path)
+        _tracer = None
+
+
+def span(
+    name: str,
+    category: str,
+    **args: t.Any,
+) -> t.ContextManager[None]:
+    """
+    Records span of the block if tracing is started, otherwise does nothing.
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.span(name, category, **args)
+
+
+def record(name: str, category: str, started: float, **args: t.Any):
+    """
+    Records span which was started at ``started`` (``time.perf_counter``
+    value) and has just finished, if tracing is started.
+    """
+    if _tracer is not None:
+        _tracer.record(name, category, started, **args)
+
+
+def traced(category: str) -> t.Callable[[t.Callable[P, R]], t.Callable[P, R]]:
+    """
+    Decorator which records span of each call of the function named after it,
+    e.g. "config.load".
+    """
+
+    def decorator(func: t.Callable[P, R]) -> t.Callable[P, R]:
+        module = func.__module__.removeprefix('config_keeper.')
+        name = f'{module}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
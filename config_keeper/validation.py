@@ -1,17 +1,18 @@
 import functools
 import os
 import re
-import subprocess
 import typing as t
 from pathlib import Path
 
-from config_keeper import config
+from config_keeper import config, tracing
 from config_keeper import exceptions as exc
+from config_keeper.backends import BACKENDS
 from config_keeper.output import (
     print_critical,
     print_error,
     print_warning,
 )
+from config_keeper.remotes import RemoteInfoCache
 
 TYPENAME: dict[type, str] = {
     str: 'string',
@@ -23,23 +24,6 @@ path_name_regex = re.compile(r'^[\w\-_\. ]+$')
 path_regex = re.compile(r'^[\w\/~\-\. ]+$')
 
 
-def ping_remote(
-    repository: str,
-    *,
-    capture: bool = False,
-) -> subprocess.CompletedProcess[bytes] | subprocess.CompletedProcess[str]:
-    cmd = ['git', 'ls-remote', repository, 'HEAD']
-    if capture:
-        return subprocess.run(cmd, check=True, capture_output=True, text=True)
-    return subprocess.run(
-        cmd,
-        check=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-
-
-
 def check_if_project_exists(project: str, conf: config.TConfig):
     if project not in conf['projects']:
         raise exc.ProjectDoesNotExistError(project)
@@ -107,7 +91,7 @@ class Validator:
         self._message_printers.append(functools.partial(print_critical, msg))
 
 
-RootReportType = t.Literal['unknown_param', 'type_mismatch']
+RootReportType = t.Literal['unknown_param', 'type_mismatch', 'value_constraint']
 
 
 class RootValidator(Validator):
@@ -117,19 +101,28 @@ class RootValidator(Validator):
         *,
         unknown_param: ReportLevel = 'warning',
         type_mismatch: ReportLevel = 'critical',
+        value_constraint: ReportLevel = 'error',
     ):
         super().__init__(conf)
         self.unknown_param = unknown_param
         self.type_mismatch = type_mismatch
+        self.value_constraint = value_constraint
 
+    @tracing.traced('validation')
     def validate(self) -> bool:
+        typehints = t.get_type_hints(config.TConfigBound)
         for param, value in self.conf.items():
-            if typehint := config.TConfigBound.__annotations__.get(param, None):
+            if typehint := typehints.get(param, None):
                 realtype = get_type(typehint)
                 if not isinstance(value, realtype):
                     self._report('type_mismatch', (
                         f'"{param}" is not a {TYPENAME[realtype]}.'
                     ))
+                elif param == 'git_backend' and value not in BACKENDS:
+                    choices = ', '.join(f'"{name}"' for name in BACKENDS)
+                    self._report('value_constraint', (
+                        f'"{param}" ({value}) is not one of {choices}.'
+                    ))
             else:
                 self._report('unknown_param', f'unknown parameter "{param}".')
 
@@ -173,6 +166,7 @@ class ProjectValidator(Validator):
         not_copyable_path: ReportLevel = 'error',
         not_writeable_path: ReportLevel = 'error',
         path_parents_access: ReportLevel = 'error',
+        remotes: RemoteInfoCache | None = None,
     ):
         super().__init__(conf)
         self.path_existence = path_existence
@@ -187,7 +181,35 @@ class ProjectValidator(Validator):
         self.not_copyable_path = not_copyable_path
         self.not_writeable_path = not_writeable_path
         self.path_parents_access = path_parents_access
+        self.remotes = remotes or RemoteInfoCache()
 
+    @tracing.traced('validation')
+    def check_repositories(
+        self,
+        projects: t.Iterable[str],
+        *,
+        jobs: int | None = None,
+    ):
+        """
+        Checks availability of repositories of projects concurrently using at
+        most ``jobs`` threads. Each repository is requested only once. Results
+        are reported later by ``validate``, so reports keep the same order as
+        if repositories were checked one by one. Nothing is requested if
+        availability is not reported.
+        """
+        if self.repo_availability == 'skip':
+            return
+        repositories: list[str] = []
+        for project in projects:
+            project_conf = self.conf['projects'][project]
+            if not isinstance(project_conf, dict):
+                continue
+            repository = project_conf.get('repository')  # type: ignore
+            if isinstance(repository, str):
+                repositories.append(repository)
+        self.remotes.prefetch(repositories, jobs=jobs)
+
+    @tracing.traced('validation')
     def validate(self, project: str) -> bool:
         """
         Validates project config. Project must exist. After calling,
@@ -247,6 +269,7 @@ class ProjectValidator(Validator):
             for path_name, path in sorted(value.items()):
                 self._validate_path(path_name, path, project)
 
+    @tracing.traced('validation')
     def _validate_path(self, path_name: str, path: t.Any, project: str):
         if not isinstance(path, str):
             self._report('type_mismatch', (
@@ -292,13 +315,15 @@ class ProjectValidator(Validator):
                 f'writeable because {reason}.'
             ))
 
+    @tracing.traced('validation')
     def _validate_repository(self, repository: t.Any, project: str):
-        try:
-            ping_remote(repository)
-        except subprocess.CalledProcessError:
+        if self.repo_availability == 'skip':
+            return
+        info = self.remotes.get(repository)
+        if not info.available:
             self._report('repo_availability', (
                 f'"projects.{project}.repository" ({repository}) is '
-                'unavailable.'
+                f'{info.error}.'
             ))
 
     def _report(self, report_type: ProjectReportType, msg: str):
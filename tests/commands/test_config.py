@@ -1,4 +1,8 @@
 import re
+import subprocess
+import threading
+import typing as t
+from unittest import mock
 
 from config_keeper import config, settings
 from config_keeper.validation import path_name_regex
@@ -87,6 +91,115 @@ def test_validate():
     )
 
 
+def test_validate_git_backend():
+    for value, error in (
+        (
+            'unknown',
+            'Error: "git_backend" (unknown) is not one of "subprocess", '
+            '"dulwich".',
+        ),
+        (1, 'Critical: "git_backend" is not a string.'),
+    ):
+        config.save({'git_backend': value, 'projects': {}})
+        result = invoke(['config', 'validate'])
+        assert result.exit_code == 201
+        assert error in ' '.join(result.stderr.split())
+
+    config.save({'git_backend': 'dulwich', 'projects': {}})
+    result = invoke(['config', 'validate'])
+    assert result.exit_code == 0, result.stderr
+
+
+def test_validate_checks_repositories_concurrently():
+    repo = create_repo()
+    config.save({
+        'projects': {
+            project: {
+                'branch': 'main',
+                'repository': repository,
+                'paths': {},
+            }
+            for project, repository in (
+                ('test3', 'slow/repo'),
+                ('test1', 'invalid/repo'),
+                ('test2', str(repo)),
+                ('test4', 'invalid/repo'),
+            )
+        },
+    })
+
+    real_run = subprocess.run
+    # each unique repository is checked once and every check waits for the
+    # others, which would time out if they were checked one by one
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_run(
+        cmd: list[str],
+        **kwargs: t.Any,
+    ) -> subprocess.CompletedProcess[str]:
+        assert kwargs['timeout'] == settings.PING_TIMEOUT
+        barrier.wait()
+        if cmd[-1] == 'slow/repo':
+            raise subprocess.TimeoutExpired(cmd, kwargs['timeout'])
+        return real_run(cmd, **kwargs)
+
+    settings.PING_TIMEOUT = 0.5
+    with mock.patch(
+        'config_keeper.backends.subprocess.run',
+        side_effect=fake_run,
+    ) as ping_mock:
+        result = invoke(['config', 'validate'])
+
+    assert ping_mock.call_count == 3
+    assert not barrier.broken
+    assert result.exit_code == 201
+    stderr = ' '.join(result.stderr.split())
+    repository_errors = [
+        '"projects.test1.repository" (invalid/repo) is unavailable.',
+        '"projects.test3.repository" (slow/repo) is unavailable (no response '
+        'in 0.5 seconds).',
+        '"projects.test4.repository" (invalid/repo) is unavailable.',
+    ]
+    positions = [stderr.index(error) for error in repository_errors]
+    # reports keep order of projects
+    assert positions == sorted(positions)
+    assert '"projects.test2.repository"' not in stderr
+
+
+def test_validate_with_dulwich_backend_respects_ping_timeout():
+    settings.GIT_BACKEND = 'dulwich'
+    settings.PING_TIMEOUT = 0.1
+    repo = create_repo()
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'main',
+                'repository': str(repo),
+                'paths': {},
+            },
+        },
+    })
+
+    released = threading.Event()
+    with mock.patch(
+        'dulwich.porcelain.ls_remote',
+        side_effect=lambda *_: released.wait(),
+    ):
+        result = invoke(['config', 'validate'])
+    released.set()
+
+    assert result.exit_code == 201
+    stderr = ' '.join(result.stderr.split())
+    assert '"projects.test1.repository"' in stderr
+    assert 'is unavailable (no response in 0.1 seconds).' in stderr
+
+    # errors of dulwich are still reported, not only timeouts
+    repo.rename(repo.with_name('moved'))
+    result = invoke(['config', 'validate'])
+    assert result.exit_code == 201
+    assert '"projects.test1.repository"' in result.stderr
+
+
 def test_validate_files_permissions():
     file_without_read_perm = create_file(
         name='file_without_read_perm',
@@ -1,4 +1,7 @@
+from unittest import mock
+
 from config_keeper import config, settings
+from config_keeper.remotes import ls_remote
 
 from tests.helpers import create_repo, invoke
 
@@ -105,6 +108,37 @@ def test_create():
     }
 
 
+def test_create_with_remote_cache():
+    repo = create_repo()
+    settings.REMOTE_CACHE_TTL = 60
+
+    result = invoke([
+        'project', 'create', 'test1', f'--repository={repo}', '--branch=main',
+    ])
+    assert result.exit_code == 0, result.stdout
+    assert 'OK' in result.stdout
+
+    with mock.patch(
+        'config_keeper.remotes.ls_remote',
+        wraps=ls_remote,
+    ) as ls_remote_mock:
+        result = invoke([
+            'project', 'create', 'test2', f'--repository={repo}',
+            '--branch=main',
+        ])
+        assert result.exit_code == 0, result.stdout
+        assert 'OK' in result.stdout
+        ls_remote_mock.assert_not_called()
+
+        result = invoke([
+            'project', 'update', 'test2', f'--repository={repo}',
+            '--no-cache',
+        ])
+        assert result.exit_code == 0, result.stdout
+        assert 'OK' in result.stdout
+        ls_remote_mock.assert_called_once_with(str(repo))
+
+
 def test_update():
     # non-existing project
     result = invoke(['project', 'update', 'some', '--repository=some'])
@@ -1,20 +1,40 @@
 import importlib.metadata
+import json
+import os
+import pstats
+import re
+import shutil
 import subprocess
+import typing as t
+from pathlib import Path
 from unittest import mock
 from uuid import uuid1
 
 import pytest
 from config_keeper import config, settings
 from config_keeper import exceptions as exc
+from config_keeper.backends import GitBackend
+from config_keeper.manifest import get_manifest_file
+from config_keeper.remotes import get_cache_file, ls_remote
 from config_keeper.sync_handler import (
     SyncHandler,
+    copy_exactly,
+    get_mirror_dir,
+    get_mirror_head,
 )
 from config_keeper.sync_handler import (
     run_cmd as sync_handler_run_cmd,
 )
 from freezegun import freeze_time
 
-from tests.helpers import create_dir, create_file, create_repo, invoke, run_cmd
+from tests.helpers import (
+    TMP_DIR,
+    create_dir,
+    create_file,
+    create_repo,
+    invoke,
+    run_cmd,
+)
 
 
 def test_version():
@@ -195,19 +215,17 @@ def test_error_on_push():
         },
     })
 
+    real_init = SyncHandler.__init__
+
     def trouble_maker(
         self: SyncHandler,
         project: str,
         conf: config.TConfig,
-        *,
-        verbose_output: bool = False,
+        **kwargs: t.Any,
     ):
         if project in ('test1', 'test3'):
             conf['projects'][project]['repository'] = 'invalid/repo'
-        self.project = project
-        self.conf = conf
-        self._output = ''
-        self.verbose_output = verbose_output
+        real_init(self, project, conf, **kwargs)
 
     with mock.patch(
         'config_keeper.sync_handler.SyncHandler.__init__',
@@ -559,11 +577,101 @@ def test_sync_with_verbose():
 
     result = invoke(['pull', 'test1', '--no-ask', '--verbose'])
     assert result.exit_code == 0
-    assert 'my_branch  -> FETCH_HEAD' in result.stdout
+    # mirror already has the pushed commit
+    assert 'Fetched ' not in result.stdout
+    assert 'FETCH_HEAD' not in result.stdout
     assert 'Put ' in result.stdout
     assert 'Deleted ' in result.stdout
 
 
+def test_sync_counts_processes():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    def get_spawned(output: str) -> int:
+        match = re.search(r'Spawned (\d+) process(es)? in [\d.]+s', output)
+        assert match, output
+        return int(match.group(1))
+
+    result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    # init, clone, switch, ls-files, add, commit, rev-parse, push to
+    # repository and to mirror, ls-tree
+    assert get_spawned(result.stdout) == 10
+
+    result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    # rev-parse (mirror head), clone, checkout, ls-files, add, diff-index,
+    # ls-tree: mirror already has the pushed commit, nothing is fetched
+    assert get_spawned(result.stdout) == 7
+
+    result = invoke(['status', 'test1', '-v'])
+    assert result.exit_code == 0, result.stderr
+    assert get_spawned(result.stdout) == 2
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Spawned' not in result.stdout
+
+
+def test_push_if_mirror_is_not_updated():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    mirror = get_mirror_dir(str(repo))
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    real_push = GitBackend.push
+
+    def push(
+        self: GitBackend,
+        repo_dir: Path,
+        repository: str,
+        *args: t.Any,
+        **kwargs: t.Any,
+    ) -> str:
+        if repository == str(mirror):
+            raise subprocess.CalledProcessError(
+                1, ['git', 'push'], '', 'error: mirror is broken',
+            )
+        return real_push(self, repo_dir, repository, *args, **kwargs)
+
+    with mock.patch.object(GitBackend, 'push', push):
+        result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    assert 'error: mirror is broken' in result.stdout
+    assert get_mirror_head(mirror, 'my_branch') is None
+
+    # the next run fetches the branch instead
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert get_mirror_head(mirror, 'my_branch') == run_cmd([
+        'git', '-C', str(repo), 'rev-parse', 'my_branch',
+    ]).stdout.strip()
+
+
 def test_push_with_invalid_config():
     repo = create_repo()
 
@@ -612,3 +720,1288 @@ def test_cannot_use_ref_with_multiple_projects():
     assert result.stderr == (
         'Error: --ref option cannot be used with multiple projects.\n'
     )
+
+
+def test_sync_reuses_mirror():
+    repo = create_repo()
+    some_file = create_file(name='some_file', content='first')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    mirror = get_mirror_dir(str(repo))
+    assert not mirror.exists()
+
+    result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Created mirror' in result.stdout
+    assert mirror.is_dir()
+
+    some_file.write_text('second')
+    result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Created mirror' not in result.stdout
+
+    some_file.unlink()
+    result = invoke(['pull', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Created mirror' not in result.stdout
+    assert some_file.read_text() == 'second'
+
+    # mirror is fetched incrementally and contains both pushes
+    result = run_cmd([
+        'git', '-C', str(mirror), 'log', '--pretty=oneline', 'my_branch',
+    ])
+    assert len(result.stdout.splitlines()) == 2
+
+
+def test_push_with_jobs():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    projects = [f'test{i}' for i in range(1, 5)]
+
+    config.save({
+        'projects': {
+            project: {
+                'branch': f'branch_{project}',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            }
+            for project in projects
+        },
+    })
+
+    result = invoke(['push', *projects, '--no-ask', '--jobs', '4'])
+    assert result.exit_code == 0, result.stderr
+    assert result.stdout.endswith('Operation successfully completed.\n')
+
+    # panels are printed in the same order as projects were given
+    positions = [result.stdout.index(project) for project in projects]
+    assert positions == sorted(positions)
+
+    for project in projects:
+        run_cmd(['git', '-C', str(repo), 'checkout', f'branch_{project}'])
+        assert (repo / 'some_file').read_text() == 'some file content'
+
+    result = invoke(['pull', *projects, '--no-ask', '-j', '0'])
+    assert result.exit_code == 2
+
+
+def test_sync_requests_each_remote_once():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            project: {
+                'branch': f'branch_{project}',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            }
+            for project in ('test1', 'test2', 'test3')
+        },
+    })
+
+    with mock.patch(
+        'config_keeper.remotes.ls_remote',
+        wraps=ls_remote,
+    ) as ls_remote_mock:
+        result = invoke(['push', 'test1', 'test2', 'test3', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    ls_remote_mock.assert_called_once_with(str(repo))
+
+    some_file.unlink()
+    with mock.patch(
+        'config_keeper.remotes.ls_remote',
+        wraps=ls_remote,
+    ) as ls_remote_mock:
+        result = invoke(['pull', 'test1', 'test2', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    ls_remote_mock.assert_called_once_with(str(repo))
+    assert some_file.read_text() == 'some file content'
+
+
+def test_sync_with_remote_cache():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    settings.REMOTE_CACHE_TTL = 60
+
+    for i in range(2):
+        some_file.write_text(f'content {i}')
+        with mock.patch(
+            'config_keeper.remotes.ls_remote',
+            wraps=ls_remote,
+        ) as ls_remote_mock:
+            result = invoke(['push', 'test1', '--no-ask'])
+        assert result.exit_code == 0, result.stderr
+
+    # second push used cached info, including head pushed by the first one
+    ls_remote_mock.assert_not_called()
+    result = run_cmd([
+        'git', '-C', str(repo), 'log', '--pretty=oneline', 'my_branch',
+    ])
+    assert len(result.stdout.splitlines()) == 2
+
+    # pull always fetches because cached heads may be outdated
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    (repo / 'some_file').write_text('new content')
+    run_cmd(['git', '-C', str(repo), 'commit', '-am', 'some message'])
+    run_cmd(['git', '-C', str(repo), 'checkout', '-b', 'empty'])
+    result = invoke(['pull', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert some_file.read_text() == 'new content'
+
+    with mock.patch(
+        'config_keeper.remotes.ls_remote',
+        wraps=ls_remote,
+    ) as ls_remote_mock:
+        result = invoke(['pull', 'test1', '--no-ask', '--no-cache'])
+    assert result.exit_code == 0, result.stderr
+    ls_remote_mock.assert_called_once_with(str(repo))
+
+    # failed operation invalidates cache
+    run_cmd(['git', '-C', str(repo), 'branch', '-D', 'my_branch'])
+    result = invoke(['pull', 'test1', '--no-ask'])
+    assert result.exit_code == 220
+    with mock.patch(
+        'config_keeper.remotes.ls_remote',
+        wraps=ls_remote,
+    ) as ls_remote_mock:
+        result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    ls_remote_mock.assert_called_once_with(str(repo))
+
+    # broken cache file is ignored
+    for broken_content in (
+        f'{{"{repo}": {{"heads": []}}}}',
+        'not a json',
+        '[]',
+    ):
+        get_cache_file().write_text(broken_content)
+        some_file.write_text(broken_content)
+        result = invoke(['push', 'test1', '--no-ask'])
+        assert result.exit_code == 0, result.stderr
+
+
+def test_shallow_push():
+    repo = create_repo()
+    some_file = create_file(content='first')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    run_cmd(['git', '-C', str(repo), 'checkout', '-b', 'my_branch'])
+    for content in ('second', 'third'):
+        (repo / 'some_file').write_text(content)
+        run_cmd(['git', '-C', str(repo), 'add', '.'])
+        run_cmd(['git', '-C', str(repo), 'commit', '-m', content])
+    run_cmd(['git', '-C', str(repo), 'checkout', '-b', 'empty'])
+
+    result = invoke(['push', 'test1', '--no-ask', '--shallow', '-v'])
+    assert result.exit_code == 0, result.stderr
+
+    # mirror has only fetched tip of the branch and pushed commit
+    mirror = get_mirror_dir(str(repo))
+    assert (mirror / 'shallow').is_file()
+    result = run_cmd([
+        'git', '-C', str(mirror), 'rev-list', '--count', 'my_branch',
+    ])
+    assert result.stdout.strip() == '2'
+
+    # but remote history is preserved
+    result = run_cmd([
+        'git', '-C', str(repo), 'rev-list', '--count', 'my_branch',
+    ])
+    assert result.stdout.strip() == '3'
+
+
+@pytest.mark.parametrize('options', [['--shallow'], ['--partial']])
+def test_shallow_pull(options: list[str]):
+    repo = create_repo()
+    dest = create_dir()
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(dest / 'some_file'),
+                    'some_dir': str(dest / 'some_dir'),
+                    'missing_file': str(dest / 'missing_file'),
+                },
+            },
+        },
+    })
+
+    run_cmd(['git', '-C', str(repo), 'config', 'uploadpack.allowFilter', '1'])
+    run_cmd(['git', '-C', str(repo), 'checkout', '-b', 'my_branch'])
+    for content in ('old_content', 'new_content'):
+        (repo / 'some_file').write_text(content)
+        (repo / 'some_dir').mkdir(exist_ok=True)
+        (repo / 'some_dir' / 'nested_file').write_text(content)
+        (repo / 'not_in_project').write_text(content)
+        run_cmd(['git', '-C', str(repo), 'add', '.'])
+        run_cmd(['git', '-C', str(repo), 'commit', '-m', content])
+    run_cmd(['git', '-C', str(repo), 'checkout', '-b', 'empty'])
+
+    result = invoke(['pull', 'test1', '--no-ask', *options])
+    assert result.exit_code == 0, result.stderr
+    assert (dest / 'some_file').read_text() == 'new_content'
+    assert (dest / 'some_dir' / 'nested_file').read_text() == 'new_content'
+    assert not (dest / 'missing_file').exists()
+    assert not (dest / 'not_in_project').exists()
+
+    mirror = get_mirror_dir(str(repo))
+    if '--partial' in options:
+        assert not mirror.exists()
+    else:
+        assert (mirror / 'shallow').is_file()
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_push_replaces_changed_files(incremental: bool):
+    repo = create_repo()
+    source_dir = create_dir()
+    some_file = create_file(parent=source_dir, content='some file content')
+    another_file = create_file(parent=source_dir, content='another')
+    nested_dir = create_dir(parent=source_dir)
+    create_file(parent=nested_dir, name='unchanged', content='same')
+    create_file(parent=nested_dir, name='changed', content='old')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'another_file': str(another_file),
+                    'nested_dir': str(nested_dir),
+                },
+            },
+        },
+    })
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    (nested_dir / 'changed').write_text('new')
+    (nested_dir / 'added').write_text('added')
+    some_file.unlink()
+    conf = config.load()
+    del conf['projects']['test1']['paths']['some_file']
+    config.save(conf)
+
+    options = ['--incremental' if incremental else '--no-incremental', '-v']
+    result = invoke(['push', 'test1', '--no-ask', *options])
+    assert result.exit_code == 0, result.stderr
+    stdout = ' '.join(result.stdout.replace('│', '').split())
+    if incremental:
+        assert '(1 added, 1 changed, 0 deleted, 1 unchanged)' in stdout
+    else:
+        assert 'unchanged)' not in stdout
+    assert re.search(r'Copied \d+ files? using', stdout)
+
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    assert sorted(p.name for p in repo.iterdir()) == [
+        '.git', 'another_file', 'nested_dir',
+    ]
+    assert sorted(p.name for p in (repo / 'nested_dir').iterdir()) == [
+        'added', 'changed', 'unchanged',
+    ]
+    assert (repo / 'nested_dir' / 'changed').read_text() == 'new'
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_pull_replaces_changed_files(incremental: bool):
+    repo = create_repo()
+    source_dir = create_dir()
+    create_file(parent=source_dir, name='unchanged', content='same')
+    changed = create_file(parent=source_dir, name='changed', content='new')
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'source_dir': str(source_dir),
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    changed.write_text('old')
+    create_file(parent=source_dir, name='extra', content='extra')
+    unchanged_stat = (source_dir / 'unchanged').stat()
+
+    options = ['--incremental' if incremental else '--no-incremental', '-v']
+    result = invoke(['pull', 'test1', '--no-ask', *options])
+    assert result.exit_code == 0, result.stderr
+    stdout = ' '.join(result.stdout.replace('│', '').split())
+    if incremental:
+        assert '(0 added, 1 changed, 1 deleted, 1 unchanged)' in stdout
+    else:
+        assert 'unchanged)' not in stdout
+
+    assert sorted(p.name for p in source_dir.iterdir()) == [
+        'changed', 'unchanged',
+    ]
+    assert changed.read_text() == 'new'
+    assert some_file.read_text() == 'some file content'
+    new_unchanged_stat = (source_dir / 'unchanged').stat()
+    assert (
+        new_unchanged_stat.st_ino == unchanged_stat.st_ino
+    ) is incremental
+
+
+def test_push_without_changes():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Committed as' in result.stdout
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Already up to date' in result.stdout
+    assert 'Committed as' not in result.stdout
+    assert get_manifest_file('test1').is_file()
+
+    result = run_cmd([
+        'git', '-C', str(repo), 'log', '--pretty=oneline', 'my_branch',
+    ])
+    assert len(result.stdout.splitlines()) == 1
+
+
+def test_status():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    another_file = create_file(content='another file content')
+    some_dir = create_dir()
+    create_file(parent=some_dir, name='nested', content='nested')
+    executable = create_file(parent=some_dir, name='executable', content='x')
+    executable.chmod(0o755)
+    nested_dir = create_dir(parent=some_dir, name='nested_dir')
+    create_file(parent=nested_dir, name='file', content='file')
+    create_dir(parent=some_dir, name='empty_dir')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'another_file': str(another_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+            'test2': {
+                'branch': 'new_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    def get_states() -> dict[str, str]:
+        result = invoke(['status', 'test1'])
+        assert result.exit_code == 0, result.stderr
+        stdout = ' '.join(result.stdout.replace('│', '').split())
+        return {
+            path.rsplit('/', 1)[-1]: state
+            for state, path in re.findall(
+                r'(in sync|[\w-]+-modified|diverged|missing) (\S+)',
+                stdout,
+            )
+        }
+
+    # all projects are shown by default
+    result = invoke(['status'])
+    assert result.exit_code == 0, result.stderr
+    assert 'test1' in result.stdout
+    assert 'test2' in result.stdout
+    assert 'local-modified' in result.stdout
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert get_states() == {
+        some_file.name: 'in sync',
+        another_file.name: 'in sync',
+        some_dir.name: 'in sync',
+    }
+
+    # change repository directly
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    (repo / 'some_dir' / 'nested').write_text('changed in repository')
+    (repo / 'another_file').write_text('changed in repository')
+    run_cmd(['git', '-C', str(repo), 'commit', '-am', 'remote change'])
+
+    some_file.write_text('changed locally')
+    another_file.write_text('changed locally')
+    (some_dir / 'empty_dir' / 'new').write_text('new')
+    assert get_states() == {
+        some_file.name: 'local-modified',
+        another_file.name: 'diverged',
+        some_dir.name: 'diverged',
+    }
+
+    shutil.rmtree(some_dir / 'empty_dir')
+    another_file.unlink()
+    assert get_states() == {
+        some_file.name: 'local-modified',
+        another_file.name: 'missing',
+        some_dir.name: 'remote-modified',
+    }
+
+    # history of syncs is unknown
+    get_manifest_file('test1').unlink()
+    assert get_states() == {
+        some_file.name: 'diverged',
+        another_file.name: 'missing',
+        some_dir.name: 'diverged',
+    }
+
+    with mock.patch(
+        'config_keeper.sync_handler.get_tree_objects',
+        side_effect=subprocess.CalledProcessError(1, 'git', '', 'some error'),
+    ):
+        result = invoke(['status', 'test1'])
+    assert result.exit_code == 220
+    assert 'some error' in result.stdout
+
+
+def test_status_without_connection():
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {'some_file': str(some_file)},
+            },
+        },
+    })
+
+    def get_stdout(*args: str) -> str:
+        result = invoke(['status', 'test1', *args])
+        assert result.exit_code == 0, result.stderr
+        return ' '.join(result.stdout.replace('│', '').split())
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert 'in sync' in get_stdout()
+
+    # repository is changed and becomes unavailable, mirror is used as it is
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    (repo / 'some_file').write_text('changed in repository')
+    run_cmd(['git', '-C', str(repo), 'commit', '-am', 'remote change'])
+    moved_repo = repo.rename(repo.with_name(f'{repo.name}_moved'))
+    result = invoke(['status', 'test1'])
+    assert result.exit_code == 0, result.stderr
+    assert 'unavailable' in result.stderr
+    stdout = ' '.join(result.stdout.replace('│', '').split())
+    assert 'Repository is unavailable, compared with its last' in stdout
+    assert 'in sync' in stdout
+
+    # offline mode does not connect at all
+    moved_repo.rename(repo)
+    with mock.patch('config_keeper.remotes.ls_remote') as ls_remote_mock:
+        stdout = get_stdout('--offline')
+    ls_remote_mock.assert_not_called()
+    assert 'in sync' in stdout
+    assert 'unavailable' not in stdout
+
+    assert 'remote-modified' in get_stdout()
+    assert 'remote-modified' in get_stdout('--offline')
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_push_with_link(incremental: bool):
+    # temporary repository is created in data directory, which does not
+    # exist yet on the first run
+    settings.DATA_DIR = TMP_DIR / f'data_{uuid1()}'
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    some_dir = create_dir()
+    nested_file = create_file(parent=some_dir, content='nested')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+        },
+    })
+
+    options = ['--incremental' if incremental else '--no-incremental']
+    for content in ('first', 'second'):
+        some_file.write_text(content)
+        result = invoke(['push', 'test1', '--no-ask', '--link', '-v', *options])
+        assert result.exit_code == 0, result.stderr
+        assert 'using hardlink' in ' '.join(result.stdout.split())
+
+    # links are removed together with temporary repository
+    assert some_file.stat().st_nlink == 1
+    assert nested_file.stat().st_nlink == 1
+    assert nested_file.read_text() == 'nested'
+
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    assert (repo / 'some_file').read_text() == 'second'
+    assert (repo / 'some_dir' / nested_file.name).read_text() == 'nested'
+
+
+@pytest.mark.parametrize('engine', ['index', 'fast-import'])
+def test_push_with_engine(engine: str):
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    some_dir = create_dir()
+    create_file(parent=some_dir, name='nested', content='nested')
+    executable = create_file(parent=some_dir, name='executable', content='x')
+    executable.chmod(0o755)
+    nested_dir = create_dir(parent=some_dir, name='nested_dir')
+    create_file(parent=nested_dir, name='file', content='file')
+    create_dir(parent=some_dir, name='empty_dir')
+    create_file(parent=nested_dir, name='"quoted\nname', content='quoted')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+        },
+    })
+
+    def get_tree(engine: str) -> str:
+        result = invoke(['push', 'test1', '--no-ask', '--engine', engine])
+        assert result.exit_code == 0, result.stderr
+        result = run_cmd([
+            'git', '-C', str(repo), 'ls-tree', '-r', 'my_branch',
+        ])
+        return result.stdout
+
+    # the same tree as with working tree engine
+    tree = get_tree(engine)
+    assert '100755 blob' in tree
+    assert 'some_dir/nested_dir/file' in tree
+    some_file.write_text('changed')
+    get_tree('worktree')
+    some_file.write_text('some file content')
+    assert get_tree(engine) == tree
+
+    result = invoke(['push', 'test1', '--no-ask', '--engine', engine])
+    assert result.exit_code == 0, result.stderr
+    assert 'Already up to date' in result.stdout
+
+    result = run_cmd([
+        'git', '-C', str(repo), 'log', '--pretty=oneline', 'my_branch',
+    ])
+    assert len(result.stdout.splitlines()) == 3
+
+    result = invoke(['status', 'test1'])
+    assert result.exit_code == 0, result.stderr
+    assert 'modified' not in result.stdout
+
+    some_file.write_text('changed')
+    with mock.patch(
+        'config_keeper.sync_handler.get_file_mode',
+        return_value='bad',
+    ):
+        result = invoke(['push', 'test1', '--no-ask', '--engine', engine])
+    assert result.exit_code == 220
+
+
+@pytest.mark.parametrize('grow', [True, False])
+def test_push_with_fast_import_while_file_is_written(grow: bool):
+    repo = create_repo()
+    some_file = create_file(content='some content')
+    another_file = create_file(content='another content')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'another_file': str(another_file),
+                },
+            },
+        },
+    })
+
+    real_copy_exactly = copy_exactly
+
+    def write_and_copy(
+        source: t.IO[bytes],
+        dest: t.IO[bytes],
+        size: int,
+    ) -> int:
+        # file is rewritten after its size was taken
+        if source.name == str(some_file):
+            some_file.write_text('some content, grown' if grow else 'some')
+        return real_copy_exactly(source, dest, size)
+
+    with mock.patch(
+        'config_keeper.sync_handler.copy_exactly',
+        side_effect=write_and_copy,
+    ):
+        result = invoke([
+            'push', 'test1', '--no-ask', '--engine', 'fast-import',
+        ])
+
+    if grow:
+        # only the announced size is imported, the rest waits for next push
+        assert result.exit_code == 0, result.stderr
+        result = run_cmd([
+            'git', '-C', str(repo), 'show', 'my_branch:some_file',
+        ])
+        assert result.stdout == 'some content'
+        result = run_cmd([
+            'git', '-C', str(repo), 'show', 'my_branch:another_file',
+        ])
+        assert result.stdout == 'another content'
+    else:
+        assert result.exit_code == 220
+        stdout = ' '.join(result.stdout.split())
+        assert 'was truncated while it was read' in stdout
+        assert 'fast-import crash' not in stdout
+        result = run_cmd(
+            ['git', '-C', str(repo), 'branch', '--list', 'my_branch'],
+        )
+        assert not result.stdout
+
+
+@pytest.mark.parametrize('pull_engine', ['worktree', 'cat-file'])
+def test_sync_detects_edits_with_restored_mtime(pull_engine: str):
+    repo = create_repo()
+    some_file = create_file(content='first')
+    # recently modified files are not trusted by manifest
+    os.utime(some_file, (0, 0))
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {'some_file': str(some_file)},
+            },
+        },
+    })
+
+    def edit_in_place(content: str):
+        # the same size and modification time, like "touch -r" leaves them
+        stat = some_file.stat()
+        some_file.write_text(content)
+        os.utime(some_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    edit_in_place('secnd')
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    assert 'Committed as' in result.stdout
+    result = run_cmd(['git', '-C', str(repo), 'show', 'my_branch:some_file'])
+    assert result.stdout == 'secnd'
+
+    edit_in_place('third')
+    result = invoke(['pull', 'test1', '--no-ask', '--engine', pull_engine])
+    assert result.exit_code == 0, result.stderr
+    assert some_file.read_text() == 'secnd'
+
+
+@pytest.mark.parametrize('engine', ['index', 'fast-import'])
+def test_push_with_engine_keeps_manifest(engine: str):
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    # recently modified files are not stored in manifest
+    os.utime(some_file, (0, 0))
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {'some_file': str(some_file)},
+            },
+        },
+    })
+
+    # status fills manifest, the engine does not consult it
+    result = invoke(['status', 'test1'])
+    assert result.exit_code == 0, result.stderr
+    result = invoke(['push', 'test1', '--no-ask', '--engine', engine])
+    assert result.exit_code == 0, result.stderr
+
+    stored = json.loads(get_manifest_file('test1').read_text())
+    assert list(stored['files']) == [str(some_file)]
+    assert stored['synced'] is not None
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_pull_with_cat_file_engine(incremental: bool):
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    some_dir = create_dir()
+    create_file(parent=some_dir, name='unchanged', content='same')
+    create_file(parent=some_dir, name='changed', content='new')
+    executable = create_file(parent=some_dir, name='executable', content='x')
+    executable.chmod(0o755)
+    nested_dir = create_dir(parent=some_dir, name='nested_dir')
+    create_file(parent=nested_dir, name='file', content='file')
+    not_in_repo = create_file(content='not in repository')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+            'test2': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {},
+            },
+        },
+    })
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    # add symlink and submodule directly to repository
+    run_cmd(['git', '-C', str(repo), 'checkout', 'my_branch'])
+    (repo / 'some_dir' / 'link').symlink_to('unchanged')
+    run_cmd(['git', '-C', str(repo), 'add', '.'])
+    head = run_cmd(['git', '-C', str(repo), 'rev-parse', 'HEAD'])
+    run_cmd([
+        'git', '-C', str(repo), 'update-index', '--add', '--cacheinfo',
+        f'160000,{head.stdout.strip()},some_dir/submodule',
+    ])
+    run_cmd(['git', '-C', str(repo), 'commit', '-m', 'add link'])
+
+    conf = config.load()
+    conf['projects']['test1']['paths']['not_in_repo'] = str(not_in_repo)
+    config.save(conf)
+
+    some_file.unlink()
+    (some_dir / 'changed').write_text('old')
+    executable.chmod(0o644)
+    create_file(parent=some_dir, name='extra', content='extra')
+    shutil.rmtree(nested_dir)
+    nested_dir.write_text('file instead of directory')
+    create_dir(parent=create_dir(parent=some_dir, name='extra_dir'))
+    create_file(parent=some_dir, name='link', content='not a link')
+    unchanged_stat = (some_dir / 'unchanged').stat()
+
+    options = ['--incremental' if incremental else '--no-incremental', '-v']
+    result = invoke([
+        'pull', 'test1', 'test2', '--no-ask', '--engine', 'cat-file', *options,
+    ])
+    assert result.exit_code == 0, result.stderr
+    stdout = ' '.join(result.stdout.replace('│', '').split())
+    assert 'repository does not contain ./not_in_repo' in stdout
+    assert 'using cat-file' in stdout
+
+    assert some_file.read_text() == 'some file content'
+    assert sorted(p.name for p in some_dir.iterdir()) == [
+        'changed', 'executable', 'link', 'nested_dir', 'unchanged',
+    ]
+    assert (some_dir / 'changed').read_text() == 'new'
+    assert (some_dir / 'executable').stat().st_mode & 0o111
+    assert (some_dir / 'link').readlink() == Path('unchanged')
+    assert (nested_dir / 'file').read_text() == 'file'
+    assert not_in_repo.read_text() == 'not in repository'
+    new_unchanged_stat = (some_dir / 'unchanged').stat()
+    assert (
+        new_unchanged_stat.st_ino == unchanged_stat.st_ino
+    ) is incremental
+
+    # nothing is written again
+    result = invoke([
+        'pull', 'test1', '--no-ask', '--engine', 'cat-file', *options,
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert (some_dir / 'link').readlink() == Path('unchanged')
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_pull_with_cat_file_engine_replaces_paths(incremental: bool):
+    repo = create_repo()
+    some_file = create_file(content='some file content')
+    some_dir = create_dir()
+    create_file(parent=some_dir, name='changed', content='new')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'branch': 'my_branch',
+                'repository': str(repo),
+                'paths': {
+                    'some_file': str(some_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+        },
+    })
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    options = ['--incremental' if incremental else '--no-incremental']
+
+    # types of paths are fixed
+    some_file.unlink()
+    create_dir(parent=some_file.parent, name=some_file.name)
+    result = invoke([
+        'pull', 'test1', '--no-ask', '--engine', 'cat-file', *options,
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert some_file.read_text() == 'some file content'
+
+    shutil.rmtree(some_dir)
+    some_dir.write_text('file instead of directory')
+    result = invoke([
+        'pull', 'test1', '--no-ask', '--engine', 'cat-file', *options,
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert (some_dir / 'changed').read_text() == 'new'
+
+    some_file.write_text('changed')
+    with mock.patch(
+        'config_keeper.sync_handler.list_tree',
+        return_value={'some_file': {'': ('100644', '0' * 40)}},
+    ):
+        result = invoke([
+            'pull', 'test1', '--no-ask', '--engine', 'cat-file', *options,
+        ])
+    assert result.exit_code == 220
+    assert 'cannot read blob' in result.stdout
+    assert not some_file.exists() or some_file.read_text() == 'changed'
+    # staging file is removed
+    assert not list(some_file.parent.glob(f'.{some_file.name}.*'))
+
+
+@pytest.mark.parametrize('engine', ['worktree', 'index', 'fast-import'])
+def test_sync_with_dulwich_backend(engine: str):
+    settings.GIT_BACKEND = 'dulwich'
+    repo = create_repo(bare=True)
+    some_file = create_file(content='first')
+    some_dir = create_dir()
+    nested_file = create_file(parent=some_dir, name='nested', content='nested')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(some_file),
+                    'some_dir': str(some_dir),
+                },
+            },
+        },
+    })
+
+    options = ['--no-ask', '--engine', engine, '-v']
+    result = invoke(['push', 'test1', *options])
+    assert result.exit_code == 0, result.stderr
+    assert 'Created mirror' in result.stdout
+
+    some_file.write_text('second')
+    nested_file.unlink()
+    create_file(parent=some_dir, name='other', content='other')
+    result = invoke(['push', 'test1', *options])
+    assert result.exit_code == 0, result.stderr
+    result = run_cmd([
+        'git', '-C', str(repo), 'ls-tree', '-r', '--name-only', 'my_branch',
+    ])
+    assert result.stdout.split() == ['some_dir/other', 'some_file']
+    result = run_cmd([
+        'git', '-C', str(repo), 'rev-list', '--count', 'my_branch',
+    ])
+    assert result.stdout.strip() == '2'
+
+    result = invoke(['push', 'test1', *options])
+    assert result.exit_code == 0, result.stderr
+    assert 'Already up to date' in result.stdout
+
+    some_file.unlink()
+    shutil.rmtree(some_dir)
+    head = run_cmd(['git', '-C', str(repo), 'rev-parse', 'my_branch'])
+    for pull_options in (
+        [],
+        ['--partial'],
+        ['--engine', 'cat-file'],
+        ['--ref', head.stdout.strip()],
+    ):
+        result = invoke(['pull', 'test1', '--no-ask', *pull_options])
+        assert result.exit_code == 0, result.stderr
+        assert some_file.read_text() == 'second'
+        assert (some_dir / 'other').read_text() == 'other'
+
+    result = invoke(['status', 'test1'])
+    assert result.exit_code == 0, result.stderr
+    assert 'in sync' in result.stdout
+
+
+def test_push_with_dulwich_backend_rejects_non_fast_forward():
+    settings.GIT_BACKEND = 'dulwich'
+    repo = create_repo(bare=True)
+    some_file = create_file(content='first')
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+    result = invoke(['pull', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    # remote branch is rewritten by someone else after mirror was updated
+    other = create_repo()
+    run_cmd(['git', '-C', str(other), 'commit', '--allow-empty', '-m', 'x'])
+    run_cmd([
+        'git', '-C', str(other), 'push', '--force', str(repo),
+        'HEAD:my_branch',
+    ])
+    some_file.write_text('second')
+    with mock.patch(
+        'config_keeper.sync_handler.SyncHandler._update_mirror',
+    ):
+        result = invoke(['push', 'test1', '--no-ask', '--engine', 'index'])
+    assert result.exit_code == 220
+    assert 'non-fast-forward' in result.stdout
+
+    result = invoke(['pull', 'test1', '--no-ask', '--ref', 'missing'])
+    assert result.exit_code == 220
+    assert "couldn't find remote ref missing" in result.stdout
+
+
+def test_unknown_git_backend():
+    settings.GIT_BACKEND = 'unknown'
+    repo = create_repo()
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {},
+            },
+        },
+    })
+    result = invoke(['push', 'test1', '--no-ask'])
+    assert result.exit_code == 201
+    assert result.stderr.count('unknown git backend "unknown"') == 1
+
+    settings.GIT_BACKEND = 'dulwich'
+    with mock.patch('importlib.util.find_spec', return_value=None):
+        result = invoke(['pull', 'test1', '--no-ask'])
+    assert result.exit_code == 253
+    assert 'package "dulwich" is not installed' in result.stderr
+
+
+def test_git_backend_from_config():
+    repo = create_repo()
+    some_file = create_file(content='some content')
+    config.save({
+        'git_backend': 'dulwich',
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {'some_file': str(some_file)},
+            },
+        },
+    })
+    with mock.patch('importlib.util.find_spec', return_value=None):
+        result = invoke(['push', 'test1', '--no-ask'])
+        assert result.exit_code == 253
+        assert 'package "dulwich" is not installed' in result.stderr
+
+        # environment variable takes precedence
+        settings.GIT_BACKEND = 'subprocess'
+        result = invoke(['push', 'test1', '--no-ask'])
+        assert result.exit_code == 0, result.stderr
+
+    settings.GIT_BACKEND = None
+    some_file.write_text('changed')
+    # without the mirror the branch has to be fetched again
+    shutil.rmtree(get_mirror_dir(str(repo)))
+    result = invoke(['push', 'test1', '--no-ask', '-v'])
+    assert result.exit_code == 0, result.stderr
+    # message of dulwich fetch
+    assert 'Fetched my_branch from' in result.stdout
+    # optional key is not added to config
+    conf = config.load()
+    conf.pop('git_backend')
+    config.save(conf)
+    assert 'git_backend' not in config.load()
+
+
+def test_sync_with_timings():
+    repo = create_repo()
+    some_dir = create_dir()
+    create_file(parent=some_dir, name='first', content='12345')
+    create_file(parent=some_dir, name='second', content='123')
+    timings_file = TMP_DIR / f'timings_{uuid1()}.json'
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'my_branch',
+                'paths': {
+                    'some_dir': str(some_dir),
+                },
+            },
+        },
+    })
+
+    result = invoke([
+        'push', 'test1', '--no-ask', '--timings',
+        '--timings-file', str(timings_file),
+    ])
+    assert result.exit_code == 0, result.stderr
+    for column in ('Project', 'Phase', 'Time', 'Files', 'Size'):
+        assert column in result.stdout
+    assert re.search(r'copy\s+│\s+[\d.]+s\s+│\s+2\s+│\s+8 bytes', result.stdout)
+
+    timings = json.loads(timings_file.read_text())
+    phases = {phase['phase']: phase for phase in timings['test1']}
+    assert list(phases) == [
+        'remote', 'fetch', 'checkout', 'commit', 'copy', 'push', 'save',
+        'cleanup',
+    ]
+    assert phases['copy']['files'] == 2
+    assert phases['copy']['bytes'] == 8
+    assert all(phase['seconds'] >= 0 for phase in phases.values())
+
+    shutil.rmtree(some_dir)
+    result = invoke([
+        'pull', 'test1', '--no-ask', '--engine', 'cat-file',
+        '--timings-file', str(timings_file),
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert 'Phase' not in result.stdout
+    timings = json.loads(timings_file.read_text())
+    phases = {phase['phase']: phase for phase in timings['test1']}
+    assert list(phases) == ['fetch', 'copy', 'save']
+    assert phases['copy']['bytes'] == 8
+
+
+def test_sync_with_trace():
+    repo = create_repo()
+    some_file = create_file(content='12345')
+    trace_file = TMP_DIR / f'trace_{uuid1()}.json'
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'main',
+                'paths': {
+                    'some_file': str(some_file),
+                },
+            },
+        },
+    })
+
+    result = invoke(['--trace', str(trace_file), 'push', 'test1', '--no-ask'])
+    assert result.exit_code == 0, result.stderr
+
+    events = json.loads(trace_file.read_text())['traceEvents']
+    spans = {event['name']: event for event in events if event['ph'] == 'X'}
+    for name in (
+        'config.load',
+        'validation.ProjectValidator.validate',
+        'validation.ProjectValidator._validate_path',
+        'validation.ProjectValidator._validate_repository',
+        'git ls-remote',
+        'git commit',
+        'git push',
+        'push test1',
+        'commit',
+        'copy some_file',
+    ):
+        assert name in spans, name
+    assert spans['git push']['cat'] == 'process'
+    assert spans['copy some_file']['args'] == {'project': 'test1'}
+    assert all(span['dur'] >= 0 for span in spans.values())
+    assert any(
+        event['ph'] == 'M' and event['name'] == 'thread_name'
+        for event in events
+    )
+
+    # the same with environment variable
+    trace_file.unlink()
+    settings.TRACE_FILE = trace_file
+    result = invoke(['pull', 'test1', '--no-ask', '--engine', 'cat-file'])
+    assert result.exit_code == 0, result.stderr
+    events = json.loads(trace_file.read_text())['traceEvents']
+    names = {event['name'] for event in events}
+    assert {'pull test1', 'git cat-file', 'copy some_file'} <= names
+
+    # tracing is stopped after the run
+    trace_file.unlink()
+    settings.TRACE_FILE = None
+    result = invoke(['project', 'list'])
+    assert result.exit_code == 0, result.stderr
+    assert not trace_file.exists()
+
+
+def test_profile(monkeypatch: pytest.MonkeyPatch):
+    repo = create_repo()
+    first_file = create_file(content='12345')
+    second_file = create_file(content='123')
+    cpu_file = TMP_DIR / f'profile_{uuid1()}.prof'
+    mem_file = TMP_DIR / f'profile_{uuid1()}.txt'
+
+    config.save({
+        'projects': {
+            'test1': {
+                'repository': str(repo),
+                'branch': 'first',
+                'paths': {'first_file': str(first_file)},
+            },
+            'test2': {
+                'repository': str(repo),
+                'branch': 'second',
+                'paths': {'second_file': str(second_file)},
+            },
+        },
+    })
+
+    result = invoke([
+        '--profile', 'cpu', '--profile-file', str(cpu_file),
+        'push', 'test1', 'test2', '--no-ask', '--jobs', '2',
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert 'Profile saved to' in result.stderr
+    stats = pstats.Stats(str(cpu_file)).stats
+    functions = {function for _, _, function in stats}
+    # projects are pushed in worker threads, which are profiled too
+    assert {'load', '_push', '_commit_from_worktree'} <= functions
+
+    result = invoke([
+        '--profile', 'mem', '--profile-file', str(mem_file), 'project', 'list',
+    ])
+    assert result.exit_code == 0, result.stderr
+    report = mem_file.read_text()
+    assert report.startswith('Current: ')
+    assert 'Top 25 allocations:\n1. ' in report
+
+    # profile is saved to the current directory by default
+    monkeypatch.chdir(repo)
+    result = invoke(['--profile', 'cpu', '--version'])
+    assert result.exit_code == 0, result.stderr
+    assert (repo / 'config-keeper.prof').exists()
+
+
+def test_profile_with_single_profiler():
+    # since python 3.12 only one profiler may be active, enabling another one
+    # in a worker thread raised ValueError and push hung
+    repo = create_repo()
+    some_file = create_file(content='12345')
+    cpu_file = TMP_DIR / f'profile_{uuid1()}.prof'
+    config.save({
+        'projects': {
+            f'test{i}': {
+                'repository': str(repo),
+                'branch': f'branch{i}',
+                'paths': {'some_file': str(some_file)},
+            }
+            for i in range(2)
+        },
+    })
+
+    with mock.patch(
+        'config_keeper.profiling.sys.version_info',
+        (3, 12),
+    ), mock.patch('threading.setprofile') as setprofile_mock:
+        result = invoke([
+            '--profile', 'cpu', '--profile-file', str(cpu_file),
+            'push', 'test0', 'test1', '--no-ask', '--jobs', '2',
+        ])
+    assert result.exit_code == 0, result.stderr
+    setprofile_mock.assert_not_called()
+    stats = pstats.Stats(str(cpu_file)).stats
+    assert 'load' in {function for _, _, function in stats}
@@ -19,3 +19,14 @@ def _setup_session():
 @pytest.fixture(autouse=True)
 def _mock_config_file():
     settings.CONFIG_FILE = TMP_DIR / f'test_config_{get_config_file_id()}.yaml'
+
+
+@pytest.fixture(autouse=True)
+def _mock_data_dir():
+    settings.DATA_DIR = TMP_DIR / 'data'
+
+
+@pytest.fixture(autouse=True)
+def _restore_settings():
+    yield
+    settings.overridden_settings.clear()
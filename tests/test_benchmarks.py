@@ -0,0 +1,104 @@
+import json
+from uuid import uuid1
+
+from benchmarks import config_scale, startup, sync
+from config_keeper import settings
+from typer.testing import CliRunner
+
+from tests.helpers import TMP_DIR
+
+cli_runner = CliRunner(mix_stderr=False)
+
+
+def test_sync_benchmark():
+    output = TMP_DIR / f'bench_{uuid1()}.json'
+    args = [
+        '--tiny-files', '3', '--huge-files', '1', '--huge-size', '1000',
+        '--deep-depth', '2', '--deep-files', '1', '--repeat', '1',
+    ]
+
+    result = cli_runner.invoke(sync.cli, [*args, '--output', str(output)])
+    assert result.exit_code == 0, result.stderr
+    assert 'tiny/push' in result.stderr
+
+    results = json.loads(output.read_text())
+    assert results['benchmark'] == 'sync'
+    assert results['parameters']['tiny_files'] == 3
+    by_name = {result['name']: result for result in results['results']}
+    assert list(by_name) == [
+        f'{scenario}/{operation}'
+        for scenario in ('tiny', 'huge', 'deep')
+        for operation in ('push', 'push-unchanged', 'pull')
+    ]
+    assert by_name['tiny/push']['extra']['files'] == 3
+    assert by_name['deep/pull']['extra']['files'] == 2
+    assert by_name['huge/pull']['extra']['bytes'] == 1000
+    assert 'copy' in by_name['tiny/push']['extra']['phases']
+    assert 'copy' in by_name['tiny/pull']['extra']['phases']
+
+    # every median is slower than a zero baseline
+    for result in results['results']:
+        result['median'] = 0
+    output.write_text(json.dumps(results))
+    result = cli_runner.invoke(sync.cli, [
+        *args, '--scenario', 'tiny', '--baseline', str(output),
+    ])
+    assert result.exit_code == 1
+    assert 'Regression: tiny/push' in ' '.join(result.stderr.split())
+
+
+def test_startup_benchmark():
+    output = TMP_DIR / f'bench_{uuid1()}.json'
+    args = ['--repeat', '1', '--projects', '2', '--paths', '1']
+
+    # budgets are generous to not depend on speed of the machine
+    budgets: list[str] = []
+    for name in startup.DEFAULT_BUDGETS:
+        budgets.extend(['--budget', f'{name}=60'])
+    result = cli_runner.invoke(startup.cli, [
+        *args, *budgets, '--output', str(output),
+    ])
+    assert result.exit_code == 0, result.stderr
+
+    results = json.loads(output.read_text())
+    assert results['benchmark'] == 'startup'
+    by_name = {result['name']: result for result in results['results']}
+    assert list(by_name) == list(startup.DEFAULT_BUDGETS)
+    assert by_name['version']['extra']['budget'] == 60
+    assert by_name['import']['extra']['slowest_imports']
+
+    result = cli_runner.invoke(startup.cli, [*args, '--budget', 'version=0'])
+    assert result.exit_code == 1
+    assert 'Over budget: version' in ' '.join(result.stderr.split())
+
+    result = cli_runner.invoke(startup.cli, [*args, '--budget', 'unknown=1'])
+    assert result.exit_code == 2
+    assert 'expected NAME=SECONDS' in ' '.join(result.stderr.split())
+
+
+def test_config_scale_benchmark():
+    output = TMP_DIR / f'bench_{uuid1()}.json'
+    config_file = settings.CONFIG_FILE
+
+    result = cli_runner.invoke(config_scale.cli, [
+        '--projects', '1', '--projects', '3', '--paths', '2',
+        '--repositories', '2', '--repeat', '2', '--output', str(output),
+    ])
+    assert result.exit_code == 0, result.stderr
+    assert config_file == settings.CONFIG_FILE
+
+    results = json.loads(output.read_text())
+    assert results['benchmark'] == 'config_scale'
+    by_name = {result['name']: result for result in results['results']}
+    assert list(by_name) == [
+        f'{count}/{operation}'
+        for count in (1, 3)
+        for operation in ('load', 'validate', 'save')
+    ]
+    assert len(by_name['3/load']['runs']) == 2
+    assert by_name['3/load']['extra']['projects'] == 3
+    assert by_name['3/validate']['extra']['peak_memory'] > 0
+    assert (
+        by_name['3/save']['extra']['config_bytes']
+        > by_name['1/save']['extra']['config_bytes']
+    )
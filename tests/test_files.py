@@ -0,0 +1,250 @@
+import errno
+import os
+import sys
+from unittest import mock
+
+import pytest
+from config_keeper import files
+from config_keeper.files import sync_path
+
+from tests.helpers import create_dir, create_file
+
+
+def test_sync_path_writes_only_differences():
+    source = create_dir()
+    create_file(parent=source, name='unchanged', content='same')
+    create_file(parent=source, name='changed', content='new content')
+    create_file(parent=source, name='same_size', content='bbb')
+    create_file(parent=source, name='added', content='added')
+    executable = create_file(parent=source, name='executable', content='x')
+    executable.chmod(0o755)
+    create_file(parent=source, name='was_dir', content='was dir')
+    create_file(
+        parent=create_dir(parent=source, name='was_file'),
+        name='nested',
+        content='nested',
+    )
+    create_file(parent=source, name='was_symlink', content='was symlink')
+
+    dest = create_dir()
+    unchanged = create_file(parent=dest, name='unchanged', content='same')
+    unchanged_stat = unchanged.stat()
+    create_file(parent=dest, name='changed', content='old')
+    create_file(parent=dest, name='same_size', content='aaa')
+    create_file(parent=dest, name='executable', content='x').chmod(0o644)
+    create_file(parent=create_dir(parent=dest, name='was_dir'), name='nested')
+    create_file(parent=dest, name='was_file')
+    create_file(parent=dest, name='deleted')
+    create_dir(parent=dest, name='deleted_dir')
+    outside = create_file(content='outside')
+    (dest / 'was_symlink').symlink_to(outside)
+
+    stats = sync_path(source, dest)
+
+    assert sorted(os.listdir(dest)) == sorted(os.listdir(source))
+    for name in ('unchanged', 'changed', 'same_size', 'added', 'was_dir'):
+        assert (dest / name).read_text() == (source / name).read_text()
+    assert (dest / 'was_file' / 'nested').read_text() == 'nested'
+    assert not (dest / 'was_symlink').is_symlink()
+    assert (dest / 'was_symlink').read_text() == 'was symlink'
+    assert outside.read_text() == 'outside'
+    assert (dest / 'executable').stat().st_mode & 0o111
+    # identical file is not rewritten
+    assert unchanged.stat().st_ino == unchanged_stat.st_ino
+    assert unchanged.stat().st_mtime_ns == unchanged_stat.st_mtime_ns
+
+    assert stats.added == 4
+    assert stats.changed == 3
+    assert stats.deleted == 5
+    assert stats.unchanged == 1
+    assert str(stats) == '4 added, 3 changed, 5 deleted, 1 unchanged'
+
+    # second run changes nothing
+    stats = sync_path(source, dest)
+    assert str(stats) == '0 added, 0 changed, 0 deleted, 8 unchanged'
+
+
+def test_sync_path_with_file():
+    source = create_file(content='content')
+    dest = create_dir()
+
+    sync_path(source, dest / 'new_parent' / 'file')
+    assert (dest / 'new_parent' / 'file').read_text() == 'content'
+
+
+def test_sync_path_replaces_read_only_file():
+    source = create_file(content='new content')
+    dest_dir = create_dir()
+    dest = create_file(parent=dest_dir, content='old')
+    dest.chmod(0o444)
+    old_inode = dest.stat().st_ino
+
+    stats = sync_path(source, dest)
+    assert str(stats) == '0 added, 1 changed, 0 deleted, 0 unchanged'
+    assert dest.read_text() == 'new content'
+    # file is replaced, not written in place (root may write read-only files)
+    assert dest.stat().st_ino != old_inode
+    assert [path.name for path in dest_dir.iterdir()] == [dest.name]
+
+    source.write_text('another content')
+    copy = mock.Mock(side_effect=OSError(errno.ENOSPC, 'No space left'))
+    with pytest.raises(OSError, match='No space left'):
+        sync_path(source, dest, copy=copy)
+    # staging file is removed on failure
+    assert [path.name for path in dest_dir.iterdir()] == [dest.name]
+    assert dest.read_text() == 'new content'
+
+
+@pytest.fixture
+def _reset_unsupported_strategies():
+    files._unsupported_strategies.clear()  # pyright: ignore [reportPrivateUsage]
+    yield
+    files._unsupported_strategies.clear()  # pyright: ignore [reportPrivateUsage]
+
+
+def _fake_copy_file_range(src: int, dst: int, count: int) -> int:
+    return os.write(dst, os.read(src, count))
+
+
+def _fake_sendfile(out_fd: int, in_fd: int, offset: int, count: int) -> int:
+    return os.write(out_fd, os.pread(in_fd, count, offset))
+
+
+# all strategies, regardless of which of them the platform supports
+ALL_STRATEGIES = {
+    'reflink': files._reflink,  # pyright: ignore [reportPrivateUsage]
+    'copy_file_range': files._copy_file_range,  # pyright: ignore [reportPrivateUsage]
+    'sendfile': files._sendfile,  # pyright: ignore [reportPrivateUsage]
+}
+
+
+@pytest.mark.usefixtures('_reset_unsupported_strategies')
+def test_copy_file_falls_back_to_supported_strategy():
+    source = create_file(content='some content' * 1000)
+    source.chmod(0o755)
+    dest = create_file(content='previous content')
+
+    not_supported = OSError(errno.EOPNOTSUPP, 'not supported')
+    expected_strategies = ['copy_file_range', 'sendfile', 'read/write']
+    with (
+        mock.patch.dict(files.FAST_COPY_STRATEGIES, ALL_STRATEGIES, clear=True),
+        mock.patch.object(
+            files.fcntl,
+            'ioctl',
+            side_effect=not_supported,
+        ) as ioctl_mock,
+        # copy_file_range and sendfile are not available on every platform
+        mock.patch.object(
+            files.os,
+            'copy_file_range',
+            side_effect=_fake_copy_file_range,
+            create=True,
+        ) as copy_file_range_mock,
+        mock.patch.object(
+            files.os,
+            'sendfile',
+            side_effect=_fake_sendfile,
+            create=True,
+        ) as sendfile_mock,
+    ):
+        for i, expected_strategy in enumerate(expected_strategies):
+            if i == 1:
+                copy_file_range_mock.side_effect = not_supported
+            elif i == 2:  # noqa: PLR2004
+                sendfile_mock.side_effect = not_supported
+            assert files.copy_file(source, dest) == expected_strategy
+            assert dest.read_text() == source.read_text()
+            assert dest.stat().st_mode == source.stat().st_mode
+            assert dest.stat().st_mtime_ns == source.stat().st_mtime_ns
+
+        # unsupported strategies are not tried again
+        assert ioctl_mock.call_count == 1
+        assert copy_file_range_mock.call_count == 2
+
+
+@pytest.mark.usefixtures('_reset_unsupported_strategies')
+@pytest.mark.parametrize('strategy', ['copy_file_range', 'sendfile'])
+def test_copy_file_falls_back_if_nothing_is_copied(strategy: str):
+    # e.g. files of procfs and sysfs report size, but nothing is copied
+    source = create_file(content='some content')
+    dest = create_file(content='previous content')
+
+    with (
+        mock.patch.dict(
+            files.FAST_COPY_STRATEGIES,
+            {strategy: ALL_STRATEGIES[strategy]},
+            clear=True,
+        ),
+        mock.patch.object(
+            files.os,
+            strategy,
+            return_value=0,
+            create=True,
+        ) as strategy_mock,
+    ):
+        assert files.copy_file(source, dest) == 'read/write'
+        assert dest.read_text() == 'some content'
+        assert files.copy_file(source, dest) == 'read/write'
+    assert strategy_mock.call_count == 1
+
+
+def test_fast_copy_strategies_are_supported_by_platform():
+    assert (
+        'copy_file_range' in files.FAST_COPY_STRATEGIES
+    ) == hasattr(os, 'copy_file_range')
+    for strategy in ('reflink', 'sendfile'):
+        assert (strategy in files.FAST_COPY_STRATEGIES) == (
+            sys.platform == 'linux'
+        )
+
+    # every copy works with the available strategies
+    source = create_file(content='some content')
+    dest = create_file()
+    strategy = files.copy_file(source, dest)
+    assert strategy in {*files.FAST_COPY_STRATEGIES, 'read/write'}
+    assert dest.read_text() == 'some content'
+
+
+@pytest.mark.usefixtures('_reset_unsupported_strategies')
+def test_copy_file_reraises_other_errors():
+    source = create_file(content='some content')
+    dest = create_file()
+
+    with (
+        mock.patch.dict(files.FAST_COPY_STRATEGIES, ALL_STRATEGIES, clear=True),
+        mock.patch.object(
+            files.fcntl,
+            'ioctl',
+            side_effect=OSError(errno.EIO, 'io error'),
+        ),
+        pytest.raises(OSError, match='io error'),
+    ):
+        files.copy_file(source, dest)
+
+
+def test_link_file():
+    source = create_file(content='some content')
+    dest = create_file(content='previous content')
+
+    assert files.link_file(source, dest) == 'hardlink'
+    assert dest.samefile(source)
+
+    dest.unlink()
+    with mock.patch.object(
+        files.os,
+        'link',
+        side_effect=OSError(errno.EXDEV, 'cross-device link'),
+    ):
+        assert files.link_file(source, dest) != 'hardlink'
+    assert not dest.samefile(source)
+    assert dest.read_text() == source.read_text()
+
+    with (
+        mock.patch.object(
+            files.os,
+            'link',
+            side_effect=OSError(errno.EIO, 'io error'),
+        ),
+        pytest.raises(OSError, match='io error'),
+    ):
+        files.link_file(source, dest)
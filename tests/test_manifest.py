@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from pathlib import Path
+from unittest import mock
+
+from config_keeper.manifest import (
+    RACY_INTERVAL_NS,
+    get_manifest_file,
+    hash_file,
+    load_manifest,
+)
+
+from tests.helpers import create_dir, create_file, create_repo, run_cmd
+
+
+def make_old(path: Path):
+    mtime = time.time() - RACY_INTERVAL_NS / 10**9 * 2
+    os.utime(path, (mtime, mtime))
+
+
+def test_hash_file():
+    some_file = create_file(content='some file content\n')
+    result = run_cmd(['git', 'hash-object', str(some_file)])
+    assert hash_file(some_file) == result.stdout.strip()
+
+
+def test_manifest_recognises_unchanged_files():
+    some_file = create_file(content='aaa')
+    make_old(some_file)
+    old_blob = hash_file(some_file)
+
+    manifest = load_manifest('unchanged')
+    assert manifest.get_blob_id(some_file) == old_blob
+    manifest.save()
+
+    # the same stat, so content is not read again
+    with mock.patch('config_keeper.manifest.hash_file') as hash_mock:
+        assert load_manifest('unchanged').get_blob_id(some_file) == old_blob
+    hash_mock.assert_not_called()
+
+    # edited in place with modification time restored (like "touch -r" or
+    # "rsync --inplace -t" do), status change time still differs
+    stat = some_file.stat()
+    some_file.write_text('bbb')
+    os.utime(some_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_manifest('unchanged').get_blob_id(some_file) == hash_file(
+        some_file,
+    )
+
+    make_old(some_file)
+    assert load_manifest('unchanged').get_blob_id(some_file) == hash_file(
+        some_file,
+    )
+
+
+def test_manifest_does_not_trust_recently_modified_files():
+    some_file = create_file(content='aaa')
+    manifest = load_manifest('recent')
+    assert manifest.get_blob_id(some_file) == hash_file(some_file)
+    manifest.save()
+    stored = json.loads(get_manifest_file('recent').read_text())
+    assert stored == {'synced': None, 'files': {}}
+
+
+def test_manifest_keeps_only_used_entries():
+    first_file = create_file(content='first')
+    second_file = create_file(content='second')
+    make_old(first_file)
+    make_old(second_file)
+
+    manifest = load_manifest('used')
+    manifest.get_blob_id(first_file)
+    manifest.get_blob_id(second_file)
+    manifest.save()
+
+    manifest = load_manifest('used')
+    manifest.get_blob_id(second_file)
+    manifest.save()
+
+    content = get_manifest_file('used').read_text()
+    assert str(first_file) not in content
+    assert str(second_file) in content
+
+    # manifest which was not consulted keeps all entries
+    load_manifest('used').save()
+    assert str(second_file) in get_manifest_file('used').read_text()
+
+
+def test_broken_manifest():
+    some_file = create_file(content='aaa')
+    make_old(some_file)
+    manifest_file = get_manifest_file('broken')
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+
+    for content in (
+        'not json',
+        '[]',
+        '{"files": [], "synced": []}',
+        json.dumps({'files': {str(some_file): {'size': 3}}}),
+    ):
+        manifest_file.write_text(content)
+        manifest = load_manifest('broken')
+        assert manifest.get_blob_id(some_file) == hash_file(some_file)
+
+
+def test_object_id():
+    repo = create_repo()
+    some_dir = create_dir(parent=repo, name='some_dir')
+    create_file(parent=some_dir, name='file', content='file')
+    create_file(parent=some_dir, name='file.txt', content='file.txt')
+    create_file(parent=some_dir, name='executable').chmod(0o755)
+    nested_dir = create_dir(parent=some_dir, name='file.d')
+    create_file(parent=nested_dir, name='nested', content='nested')
+    create_dir(parent=some_dir, name='empty_dir')
+
+    run_cmd(['git', '-C', str(repo), 'add', '.'])
+    result = run_cmd(['git', '-C', str(repo), 'write-tree'])
+    tree = result.stdout.strip()
+    result = run_cmd(['git', '-C', str(repo), 'rev-parse', f'{tree}:some_dir'])
+
+    manifest = load_manifest('object_id')
+    assert manifest.get_object_id(some_dir) == result.stdout.strip()
+    assert manifest.get_object_id(some_dir / 'empty_dir') is None